@@ -0,0 +1,70 @@
+""" Memory used per match by what the app keeps, the result store and the line cache, compared to keeping LineMatch
+objects and tree labels around """
+import gc
+import tracemalloc
+
+from re_tester.engine import MatchEngine, ResultCache, CacheFiller
+from re_tester.results import ResultStore
+
+LINES = 100_000
+BATCH_SIZE = 500
+PATTERN = r'user=(?P<user>\w+) id=(\d+)'
+
+
+def corpus() -> list[str]:
+    """ Synthetic log lines, every one of them matching """
+    return [f'2024-01-01 12:00:00 INFO user=u{n % 97} id={n} request served' for n in range(LINES)]
+
+
+def measure(build) -> tuple[int, object]:
+    """ Bytes allocated by build() that are still alive after it returns """
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, kept
+
+
+def main() -> None:
+    """ Print bytes per match of both representations """
+    lines = corpus()
+    engine = MatchEngine(PATTERN)
+    results = list(engine.evaluate(lines))
+
+    def objects():
+        # What the app used to keep: the matches, plus a label per tree item
+        kept = list(engine.evaluate(lines))
+        labels = [f'Line: {index} - Full match: "{line_match.text}"' for index, line_match in kept]
+        labels += [f'Group: {group.index} - ({group.name}): "{group.text}"'
+                   for _, line_match in kept for group in line_match.groups]
+        return kept, labels
+
+    def store():
+        result_store = ResultStore()
+        result_store.extend(results)
+        return result_store
+
+    def cache():
+        # As the app fills it, batch by batch. Lines are read afresh from the test box for each evaluation, so any the
+        # cache held on to would be counted here
+        result_cache = ResultCache(LINES)
+        filler = CacheFiller(result_cache, engine.key, range(1, LINES + 1), corpus())
+        for start in range(0, len(results), BATCH_SIZE):
+            filler.add(results[start:start + BATCH_SIZE])
+        filler.done()
+        return result_cache
+
+    objects_size, _ = measure(objects)
+    store_size, _ = measure(store)
+    cache_size, _ = measure(cache)
+    print(f'{len(results)} matches')
+    print(f'LineMatch objects and labels: {objects_size / len(results):8.1f} bytes per match')
+    print(f'ResultStore:                  {store_size / len(results):8.1f} bytes per match')
+    print(f'ResultCache:                  {cache_size / len(results):8.1f} bytes per match')
+    print(f'ResultStore and ResultCache:  {(store_size + cache_size) / len(results):8.1f} bytes per match')
+
+
+if __name__ == '__main__':
+    main()
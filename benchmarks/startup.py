@@ -0,0 +1,52 @@
+"""
+Cold start time, from process start to the app being usable, over several launches of re_tester.pyw.
+The app is usable once shown, fully built and its bindings set. Needs a display (Xvfb will do).
+Results are written as JSON so runs can be compared:
+
+    python -m benchmarks.startup --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os.path
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 're_tester.pyw')
+
+
+def launch() -> float:
+    """ Start the app once, return its startup time in milliseconds """
+    output = subprocess.run([sys.executable, ENTRY_POINT, '--startup-time'], capture_output=True, text=True,
+                            check=True, timeout=60).stdout
+    return json.loads(output.splitlines()[-1])['startup_ms']
+
+
+def main(argv: list[str] = None) -> None:
+    """ Launch the app several times and write the timings """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10, help='launches, the first one warms up the disk cache')
+    parser.add_argument('--output', default='startup_results.json', help='JSON file to write')
+    args = parser.parse_args(argv)
+
+    launch()
+    timings = [launch() for _ in range(args.runs)]
+    results = {
+        'python': sys.version,
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'startup_ms': timings,
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'max_ms': max(timings),
+    }
+    print(f'startup: median {results["median_ms"]:.0f}ms, min {results["min_ms"]:.0f}ms, '
+          f'max {results["max_ms"]:.0f}ms', file=sys.stderr)
+    with open(args.output, 'w', encoding='utf-8') as w_file:
+        json.dump(results, w_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmarks of the matching and rendering hot paths, over synthetic corpora and a range of pattern shapes.
+Matching always runs; tagging, tree and gutter rendering run when a display is available (Xvfb will do).
+Results are written as JSON so runs can be compared:
+
+    python -m benchmarks.suite --sizes 1000 100000 --output before.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Optional
+
+from re_tester.engine import MatchEngine, MODE_FIRST, MODE_ALL
+from re_tester.results import ResultStore
+
+SIZES = (1_000, 100_000, 1_000_000)
+SEED = 1234
+# Shape name -> (pattern, lines matched at most, None for the whole corpus)
+PATTERNS = {
+    'literal': (r'ERROR', None),
+    'many_groups': (r'(\d+)-(\d+)-(\d+) (\d+):(\d+):(\d+) (\w+) (\w+)=(\w+) (\w+)=(\d+)', None),
+    'named_groups': (r'(?P<date>\S+) (?P<time>\S+) (?P<level>[A-Z]+) user=(?P<user>\w+) id=(?P<id>\d+)', None),
+    'overlapping_named_groups': (r'(?P<stamp>(?P<date>\S+) (?P<time>(?P<hour>\d+):\d+:\d+)) '
+                                 r'(?P<entry>(?P<level>[A-Z]+) (?P<pair>user=(?P<user>\w+)))', None),
+    # Exponential on the near-miss lines of the corpus, capped so a run stays in the seconds
+    'pathological': (r'^(\w+\s?)+$', 2_000),
+}
+# Scroll positions the rendering benchmarks are measured at, as fractions of the text
+_SCROLL_POSITIONS = (0.0, 0.25, 0.5, 0.75, 1.0)
+_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+def corpus(size: int, seed: int = SEED) -> list[str]:
+    """ Synthetic log lines, one in a hundred being a near miss for the pathological pattern """
+    rng = random.Random(seed)
+    lines = []
+    for n in range(size):
+        if n % 100 == 99:
+            lines.append('a' * rng.randint(16, 18) + '!')
+            continue
+        lines.append(f'2024-{rng.randint(1, 12):02}-{rng.randint(1, 28):02} {rng.randint(0, 23):02}:'
+                     f'{rng.randint(0, 59):02}:{rng.randint(0, 59):02} {rng.choice(_LEVELS)} '
+                     f'user=u{rng.randint(0, 999)} id={n} request served in {rng.randint(1, 999)}ms')
+    return lines
+
+
+def best_of(repeat: int, function: Callable[[], object]) -> tuple[float, object]:
+    """ Best wall time of repeat calls, and the result of the last one """
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_matching(lines: list[str], mode: str, repeat: int) -> dict:
+    """ Matching and storing times of every pattern shape """
+    response = {}
+    for shape, (pattern, line_cap) in PATTERNS.items():
+        shape_lines = lines[:line_cap]
+        engine = MatchEngine(pattern, mode)
+        match_s, results = best_of(repeat, lambda: list(engine.evaluate(shape_lines)))
+
+        def store() -> ResultStore:
+            result_store = ResultStore()
+            result_store.extend(results)
+            return result_store
+
+        store_s, _ = best_of(repeat, store)
+        response[shape] = {'lines': len(shape_lines), 'matches': len(results), 'match_s': match_s,
+                           'lines_per_s': len(shape_lines) / match_s if match_s else None, 'store_s': store_s}
+    return response
+
+
+def open_display() -> Optional[object]:
+    """ Tk root, or None if there is no display """
+    from tkinter import Tk, TclError  # pylint: disable=import-outside-toplevel
+    try:
+        root = Tk()
+    except TclError:
+        return None
+    root.geometry('1000x800')
+    return root
+
+
+def bench_rendering(root, lines: list[str], mode: str) -> dict:
+    """ Insertion, tagging, tree and gutter times, per pattern shape, averaged over several scroll positions """
+    # pylint: disable=import-outside-toplevel
+    from tkinter import BOTH
+    from tkinter.font import Font
+    from re_tester.settings import SETTINGS
+    from re_tester.frames import TestBoxFrame, ResultsTreeFrame
+
+    SETTINGS.font = Font(family=SETTINGS.font_family_name, size=SETTINGS.font_size)
+    store = ResultStore()
+    test_box = TestBoxFrame(store, root)
+    tree = ResultsTreeFrame(store, test_box.get_match_text, root)
+    test_box.pack(fill=BOTH, expand=True)
+    tree.pack(fill=BOTH, expand=True)
+
+    textbox = test_box.test_textbox
+    start = time.perf_counter()
+    with textbox.quiet():
+        textbox.insert('1.0', '\n'.join(lines))
+    root.update()
+    response = {'insert_s': time.perf_counter() - start, 'shapes': {}}
+
+    for shape, (pattern, line_cap) in PATTERNS.items():
+        store.clear()
+        store.extend(MatchEngine(pattern, mode).evaluate(lines[:line_cap]))
+        tree.clear()
+        tree.set_line_count(len(lines))
+        root.update()
+        timings = {'tag_s': 0.0, 'tree_s': 0.0, 'gutter_s': 0.0}
+        for fraction in _SCROLL_POSITIONS:
+            textbox.yview_moveto(fraction)
+            tree.yview('moveto', fraction)
+            root.update()
+            for key, render in (('tag_s', test_box.highlight), ('tree_s', tree.refresh),
+                                ('gutter_s', lambda: test_box.test_textbox_line_numbers.draw_line_numbers(textbox))):
+                test_box.test_textbox_line_numbers._drawn_view = None  # pylint: disable=protected-access
+                start = time.perf_counter()
+                render()
+                root.update_idletasks()
+                timings[key] += time.perf_counter() - start
+        response['shapes'][shape] = {key: seconds / len(_SCROLL_POSITIONS) for key, seconds in timings.items()}
+
+    test_box.destroy()
+    tree.destroy()
+    return response
+
+
+def main(argv: list[str] = None) -> None:
+    """ Run the suite and write its results """
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='corpus sizes, in lines')
+    parser.add_argument('--mode', choices=(MODE_FIRST, MODE_ALL), default=MODE_FIRST)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the best one is kept')
+    parser.add_argument('--no-render', action='store_true', help='skip rendering even if a display is available')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write')
+    args = parser.parse_args(argv)
+
+    root = None if args.no_render else open_display()
+    results = {
+        'python': sys.version,
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': SEED,
+        'mode': args.mode,
+        'rendering': root is not None,
+        'sizes': {},
+    }
+    for size in args.sizes:
+        lines = corpus(size)
+        print(f'{size} lines', file=sys.stderr)
+        size_results = {'matching': bench_matching(lines, args.mode, args.repeat)}
+        for shape, timings in size_results['matching'].items():
+            print(f'  {shape:<26} match {timings["match_s"] * 1000:10.1f}ms  store {timings["store_s"] * 1000:10.1f}ms',
+                  file=sys.stderr)
+        if root is not None:
+            size_results['rendering'] = bench_rendering(root, lines, args.mode)
+            for shape, timings in size_results['rendering']['shapes'].items():
+                print(f'  {shape:<26} ' + '  '.join(f'{key[:-2]} {seconds * 1000:8.2f}ms'
+                                                    for key, seconds in timings.items()), file=sys.stderr)
+        results['sizes'][str(size)] = size_results
+
+    if root is not None:
+        root.destroy()
+    with open(args.output, 'w', encoding='utf-8') as w_file:
+        json.dump(results, w_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
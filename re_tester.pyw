@@ -1,2 +1,7 @@
 """ Entry-point """
-import re_tester.app
+import sys
+
+from re_tester.app import main
+
+if __name__ == '__main__':
+    main(report_startup='--startup-time' in sys.argv[1:])
@@ -0,0 +1,7 @@
+""" Command-line entry-point: python -m re_tester """
+import sys
+
+from re_tester.cli import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+""" Static pattern risk analysis, flags constructs prone to catastrophic backtracking before running them """
+import functools
+import re
+from dataclasses import dataclass
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse  # pylint: disable=deprecated-module
+
+_MAXREPEAT = sre_parse.MAXREPEAT
+# Backtracking repeats, possessive ones (Python 3.11+) give nothing back
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_ATOMIC = tuple(getattr(sre_parse, op) for op in ('POSSESSIVE_REPEAT', 'ATOMIC_GROUP') if hasattr(sre_parse, op))
+_ZERO_WIDTH = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT)
+
+# Characters are approximated as a bitmask: one bit per Latin-1 character, plus one shared by everything else
+_OTHER = 1 << 256
+_ALL = (1 << 257) - 1
+
+
+def _category_mask(pattern: str) -> int:
+    """ Mask of the Latin-1 characters matching a single character pattern, plus the shared bit """
+    compiled = re.compile(pattern)
+    return sum(1 << code for code in range(256) if compiled.match(chr(code))) | _OTHER
+
+
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: _category_mask(r'\d'),
+    sre_parse.CATEGORY_NOT_DIGIT: _category_mask(r'\D'),
+    sre_parse.CATEGORY_SPACE: _category_mask(r'\s'),
+    sre_parse.CATEGORY_NOT_SPACE: _category_mask(r'\S'),
+    sre_parse.CATEGORY_WORD: _category_mask(r'\w'),
+    sre_parse.CATEGORY_NOT_WORD: _category_mask(r'\W'),
+}
+
+
+@dataclass(frozen=True)
+class Risk:
+    """ A risky sub-expression and why """
+    expression: str
+    reason: str
+
+    def __str__(self) -> str:
+        return f'Risky pattern: {self.expression} - {self.reason}'
+
+
+@functools.lru_cache(maxsize=256)
+def analyze(pattern: str, flags: int = 0) -> tuple[Risk, ...]:
+    """
+    Flag nested quantifiers, overlapping alternations under repetition and ambiguous adjacent quantifiers.
+    Cached per pattern, so it can run on every keystroke.
+    :return: tuple[Risk, ...], empty if nothing was found or the pattern does not parse
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, RecursionError, OverflowError):
+        return ()
+    risks = []
+    _check(parsed, risks)
+    return tuple(dict.fromkeys(risks))  # Drop duplicates, keep order
+
+
+def _check(items, risks: list[Risk]) -> None:
+    """ Walk a parsed (sub)pattern, appending risks found """
+    previous = None
+    for op, av in items:
+        if op in _REPEATS:
+            _, high, body = av
+            if high == _MAXREPEAT:
+                if _has_unbounded_repeat(body):
+                    risks.append(Risk(_unparse([(op, av)]), 'nested quantifiers, exponential backtracking on '
+                                                            'inputs that almost match'))
+                body_mask, _ = _first(body)
+                for branch in _branches(body):
+                    if _alternatives_overlap(branch, body_mask):
+                        risks.append(Risk(_unparse([(op, av)]), 'alternatives that can match the same text '
+                                                                'under repetition'))
+                if previous is not None and _single_char_mask(previous) & _single_char_mask((op, av)):
+                    risks.append(Risk(_unparse([previous, (op, av)]), 'adjacent quantifiers that can match the same '
+                                                                      'characters, polynomial backtracking'))
+                previous = (op, av) if _single_char_mask((op, av)) else None
+            else:
+                previous = None
+        else:
+            previous = None
+        for child in _children(op, av):
+            _check(child, risks)
+
+
+def _children(op, av) -> list:
+    """ Sub-patterns directly under a node """
+    if op in _REPEATS or op in _ATOMIC:
+        return [av[-1]] if isinstance(av, tuple) else [av]
+    if op == sre_parse.SUBPATTERN:
+        return [av[-1]]
+    if op == sre_parse.BRANCH:
+        return av[1]
+    if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        return [av[1]]
+    if op == sre_parse.GROUPREF_EXISTS:
+        return [p for p in av[1:] if p is not None]
+    return []
+
+
+def _has_unbounded_repeat(items) -> bool:
+    """ Whether a backtracking unbounded repeat is nested anywhere under items """
+    for op, av in items:
+        if op in _ATOMIC:
+            continue
+        if op in _REPEATS and av[1] == _MAXREPEAT:
+            return True
+        if any(_has_unbounded_repeat(child) for child in _children(op, av)):
+            return True
+    return False
+
+
+def _branches(items) -> list:
+    """ Alternations directly in items, or in the groups wrapping them """
+    found = []
+    for op, av in items:
+        if op == sre_parse.BRANCH:
+            found.append(av[1])
+        elif op == sre_parse.SUBPATTERN:
+            found += _branches(av[-1])
+    return found
+
+
+def _alternatives_overlap(alternatives: list, body_mask: int) -> bool:
+    """
+    Whether two alternatives can start with the same character. A nullable alternative can be followed by the next
+    repetition, so it also starts with what the repeated body does: sre_parse factors (a|aa)+ into a(?:|a)+.
+    :param body_mask: int, characters the repeated body can start with
+    """
+    seen = 0
+    for alternative in alternatives:
+        mask, nullable = _first(alternative)
+        if nullable:
+            mask |= body_mask
+        if seen & mask:
+            return True
+        seen |= mask
+    return False
+
+
+def _single_char_mask(node) -> int:
+    """ Mask of the characters an unbounded repeat of a single character matcher consumes, 0 for other nodes """
+    op, av = node
+    if op not in _REPEATS or av[1] != _MAXREPEAT or len(av[2]) != 1:
+        return 0
+    return _char_mask(*av[2][0])
+
+
+def _char_mask(op, av) -> int:
+    """ Mask of the characters a single character matcher accepts, 0 if it isn't one """
+    if op == sre_parse.LITERAL:
+        return 1 << av if av < 256 else _OTHER
+    if op == sre_parse.NOT_LITERAL:
+        return _ALL & ~(1 << av) if av < 256 else _ALL
+    if op == sre_parse.ANY:
+        return _ALL
+    if op == sre_parse.IN:
+        mask, negate = 0, False
+        for item_op, item_av in av:
+            if item_op == sre_parse.NEGATE:
+                negate = True
+            elif item_op == sre_parse.RANGE:
+                low, high = item_av
+                mask |= sum(1 << code for code in range(low, min(high, 255) + 1))
+                if high >= 256:
+                    mask |= _OTHER
+            elif item_op == sre_parse.CATEGORY:
+                mask |= _CATEGORIES.get(item_av, _ALL)
+            else:
+                mask |= _char_mask(item_op, item_av)
+        return (_ALL & ~mask) | _OTHER if negate else mask
+    return 0
+
+
+def _first(items) -> tuple[int, bool]:
+    """
+    Characters a (sub)pattern can start with
+    :return: tuple[int, bool] (mask, nullable), nullable meaning it can match the empty string
+    """
+    mask = 0
+    for op, av in items:
+        item_mask, nullable = _first_item(op, av)
+        mask |= item_mask
+        if not nullable:
+            return mask, False
+    return mask, True
+
+
+def _first_item(op, av) -> tuple[int, bool]:
+    """ _first for a single node """
+    char_mask = _char_mask(op, av)
+    if char_mask:
+        return char_mask, False
+    if op in _ZERO_WIDTH:
+        return 0, True
+    if op in _REPEATS or (op in _ATOMIC and isinstance(av, tuple)):
+        mask, nullable = _first(av[2])
+        return mask, nullable or av[0] == 0
+    if op in _ATOMIC:
+        return _first(av)
+    if op == sre_parse.SUBPATTERN:
+        return _first(av[-1])
+    if op == sre_parse.BRANCH:
+        firsts = [_first(alternative) for alternative in av[1]]
+        return functools.reduce(int.__or__, (mask for mask, _ in firsts), 0), any(n for _, n in firsts)
+    return _ALL, True  # Backreferences and anything unknown
+
+
+def _unparse(items) -> str:
+    """ Approximate source of a parsed (sub)pattern, for display """
+    # An alternation sharing its group with other nodes, as left by prefix factoring, needs a group of its own
+    return ''.join(f'(?:{_unparse_item(op, av)})' if op == sre_parse.BRANCH and len(items) > 1
+                   else _unparse_item(op, av) for op, av in items)
+
+
+def _unparse_item(op, av) -> str:
+    """ _unparse for a single node """
+    if op == sre_parse.LITERAL:
+        return re.escape(chr(av))
+    if op == sre_parse.NOT_LITERAL:
+        return f'[^{re.escape(chr(av))}]'
+    if op == sre_parse.ANY:
+        return '.'
+    if op == sre_parse.IN:
+        if len(av) == 1 and av[0][0] == sre_parse.CATEGORY:  # \d, \w... parse as a set of one category
+            return _unparse_set_item(*av[0])
+        return '[' + ''.join(_unparse_set_item(item_op, item_av) for item_op, item_av in av) + ']'
+    if op in _REPEATS or (op in _ATOMIC and isinstance(av, tuple)):
+        low, high, body = av
+        body_source = _unparse(body)
+        if len(body) != 1 or body[0][0] in (sre_parse.BRANCH,):
+            body_source = f'(?:{body_source})'
+        quantifier = {(0, _MAXREPEAT): '*', (1, _MAXREPEAT): '+', (0, 1): '?'}.get(
+            (low, high), f'{{{low},{"" if high == _MAXREPEAT else high}}}')
+        suffix = '?' if op == sre_parse.MIN_REPEAT else '+' if op not in _REPEATS else ''
+        return body_source + quantifier + suffix
+    if op == sre_parse.SUBPATTERN:
+        return f'({_unparse(av[-1])})' if av[0] is not None else f'(?:{_unparse(av[-1])})'
+    if op == sre_parse.BRANCH:
+        return '|'.join(_unparse(alternative) for alternative in av[1])
+    if op == sre_parse.AT:
+        return {sre_parse.AT_BEGINNING: '^', sre_parse.AT_END: '$'}.get(av, '\\b')
+    return '...'
+
+
+def _unparse_set_item(op, av) -> str:
+    """ _unparse for a character set member """
+    if op == sre_parse.NEGATE:
+        return '^'
+    if op == sre_parse.LITERAL:
+        return re.escape(chr(av))
+    if op == sre_parse.RANGE:
+        return f'{re.escape(chr(av[0]))}-{re.escape(chr(av[1]))}'
+    if op == sre_parse.CATEGORY:
+        return {sre_parse.CATEGORY_DIGIT: r'\d', sre_parse.CATEGORY_NOT_DIGIT: r'\D',
+                sre_parse.CATEGORY_SPACE: r'\s', sre_parse.CATEGORY_NOT_SPACE: r'\S',
+                sre_parse.CATEGORY_WORD: r'\w', sre_parse.CATEGORY_NOT_WORD: r'\W'}.get(av, '?')
+    return '?'
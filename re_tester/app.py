@@ -1,15 +1,32 @@
 """ Root widget """
+import json
 import re
-from tkinter import Tk, INSERT
+from typing import Optional, Sequence, Union
+from tkinter import Tk, INSERT, END
 from tkinter.font import Font
 
 from re_tester.settings import SETTINGS
+from re_tester.engine import MatchEngine, LineMatch, ResultCache, CacheFiller, MODE_BUFFER
+from re_tester.rules import RuleSetEngine, load_rule_set
+from re_tester.compare import CompareEngine
 from re_tester.frames import TopBarFrame, TestBoxFrame, ResultsTreeFrame, DebugFrame
+from re_tester.results import ResultStore
+from re_tester.worker import EvaluationWorker
+from re_tester.profiling import EvaluationProfile, start_profile, stop_profile, timed, process_uptime
+from re_tester.analysis import Risk, analyze
+from re_tester.tail import FileFollower
+from re_tester.mapped import MappedFile
+
+_POLL_INTERVAL_MS = 20
 
 
 class App(Tk):
-    """ ROOT Widget """
-    def __init__(self):
+    """
+    ROOT Widget.
+    Only the top bar and test box are built before the window is first shown, the rest follows right after.
+    """
+    def __init__(self, report_startup: bool = False):
+        """ :param report_startup: bool, print the startup time as JSON once fully built and bound, and close """
         super().__init__()
         self.title("re_tester")
         self.attributes("-topmost", SETTINGS.topmost)
@@ -19,15 +36,14 @@ class App(Tk):
             family=SETTINGS.font_family_name,
             size=SETTINGS.font_size
         )
+        self.results = ResultStore()
         self.top_bar_frame = TopBarFrame()
-        self.test_box_frame = TestBoxFrame()
-        self.result_tree_frame = ResultsTreeFrame()
-        self.debug_frame = DebugFrame()
+        self.test_box_frame = TestBoxFrame(self.results)
+        self.result_tree_frame = None
+        self.debug_frame = None
 
         self.top_bar_frame.grid(column=0, row=1, sticky='nsew')
         self.test_box_frame.grid(column=0, row=2, sticky='nsew')
-        self.result_tree_frame.grid(column=0, row=3, sticky='nsew')
-        self.debug_frame.grid(column=0, row=4, sticky='nsew')
 
         self.grid_rowconfigure(1, weight=0)
         self.grid_rowconfigure(2, weight=3)
@@ -35,55 +51,343 @@ class App(Tk):
         self.grid_rowconfigure(4, weight=0)
         self.grid_columnconfigure(0, weight=1)
 
-        # Set bindings
-        self.set_bindings()
+        # Pending evaluation job, and generation counter used to drop superseded results
+        self._evaluation_job = None
+        self._generation = 0
+        # Matching runs in a worker process, polled for results while busy
+        self.worker = EvaluationWorker(SETTINGS.evaluation_batch_size)
+        self._poll_job = None
+        # Per-line results cache, and state of the last evaluation so edits can be evaluated incrementally
+        self.cache = ResultCache(SETTINGS.result_cache_size)
+        self._engine = None
+        self._complete = False
+        self._filler = None  # Caches the results of the job in flight as they stream in
+        # Profile of the last evaluation, when profiling is enabled
+        self.profile = None
+        # Key of the risky engine the user last confirmed running over a large test box
+        self._confirmed_key = None
+        # File followed into the test box, polled for appended lines
+        self.follower = None
+        self._follow_job = None
+        # File the test box was loaded from, read instead of the widget until the test box is edited
+        self.source = None
+
+        # Seconds from process start to the app being fully built, its bindings set
+        self.startup_s = None
+        self._report_startup = report_startup
+
         # Focus regex text box
         self.top_bar_frame.regex_text_box.focus_set()
+        # Once the pending redraws are done, finish building
+        self.after_idle(self.after, 0, self._finish_startup)
+
+    def _finish_startup(self) -> None:
+        """ Build what the first paint can do without: the results tree and its styling, the debug frame, bindings """
+        self.result_tree_frame = ResultsTreeFrame(self.results, self.test_box_frame.get_match_text)
+        self.debug_frame = DebugFrame()
+        self.result_tree_frame.grid(column=0, row=3, sticky='nsew')
+        self.debug_frame.grid(column=0, row=4, sticky='nsew')
+        self.set_bindings()
+        if self.top_bar_frame.get_regex_pattern():  # Typed before the bindings were there
+            self.on_text_mod()
+        self.startup_s = process_uptime()  # Fully usable from here on
+        if self._report_startup:
+            print(json.dumps({'startup_ms': self.startup_s * 1000}))
+            self.destroy()
 
     def set_bindings(self) -> None:
         """ Set bindings """
         self.top_bar_frame.regex_text_box.bind("<<TextModified>>", lambda x: self.on_text_mod())
-        self.test_box_frame.test_textbox.bind("<<TextModified>>", lambda x: self.on_text_mod())
+        self.test_box_frame.test_textbox.bind("<<TextModified>>", lambda x: self.on_test_text_mod())
         self.test_box_frame.test_textbox.bind("<KP_Enter>", lambda x: self.test_box_frame.test_textbox.insert(
             INSERT, '\n'))
         self.top_bar_frame.regex_string.trace_add("write", lambda x, y, z: self.on_text_mod())  # Ugly!
+        self.top_bar_frame.regex_b_string.trace_add("write", lambda x, y, z: self.on_text_mod())
+        self.top_bar_frame.bind_compare(self.on_text_mod)
+        self.top_bar_frame.trace_options(self.on_text_mod)
+        self.top_bar_frame.bind_rules(self.on_text_mod)
+        self.top_bar_frame.bind_open(self.open_file)
+        self.top_bar_frame.bind_follow(self.toggle_follow)
+
+    def on_test_text_mod(self) -> None:
+        """ The test box was edited, it no longer mirrors the file it was loaded from """
+        if self.test_box_frame.loading:
+            return  # The test box is read-only meanwhile, and gets evaluated once loaded
+        self._close_source()
+        self.on_text_mod()
 
     def on_text_mod(self) -> None:
-        """ When text is modified in either textbox. """
+        """ When text is modified in either textbox, collapse bursts of edits into a single evaluation. """
+        # The profile covers the edit, from redrawing the gutter to drawing the results of the evaluation it triggers
+        self.profile = start_profile(SETTINGS.profiling_enabled)
         self.test_box_frame.text_was_modified()
+        if self.top_bar_frame.rules_path is None:  # Rule sets are analyzed once loaded, on evaluation
+            risks = analyze(self.top_bar_frame.get_regex_pattern(), self.top_bar_frame.get_flags())
+            if self.top_bar_frame.comparing:
+                risks += analyze(self.top_bar_frame.get_regex_pattern_b(), self.top_bar_frame.get_flags())
+            self.debug_frame.show_risks(risks)
+        if self._evaluation_job is not None:
+            self.after_cancel(self._evaluation_job)
+        self._evaluation_job = self.after(SETTINGS.evaluation_delay_ms, self.evaluate)
+
+    def evaluate(self) -> None:
+        """
+        Evaluate the current pattern against the test box. When only the test text changed since the last complete
+        evaluation, just the lines touched by the edits are re-matched, re-tagged and re-inserted in the tree.
+        """
+        self._evaluation_job = None
+        if self.test_box_frame.loading:
+            self._stop_profile()
+            return  # Evaluated once loaded
+        self._generation += 1  # Supersedes any evaluation still in flight
+        dirty = self.test_box_frame.test_textbox.pop_dirty()
         self.debug_frame.clear()
-        self.result_tree_frame.clear()
+        if self.source is not None and self.source.changed:  # Its mapping can no longer be read safely
+            self._close_source()
+            self.debug_frame.show_error(OSError('The file changed on disk, evaluating the test box contents instead.'))
         pattern = self.top_bar_frame.get_regex_pattern()
-        if pattern:
-            try:
-                self.re_get(pattern, self.test_box_frame.get_test_textbox_contents())
-            except re.error as e:
-                self.debug_frame.show_error(e)
-
-    def re_get(self, patt: str, matcher_text: list[str]) -> None:
-        """ Attempt the regex match and highlight/add to the tree accordingly. """
-        for index, line in enumerate(matcher_text, start=1):
-            match = re.search(re.compile(patt), line)
-            if match:
-                s_tree = self.result_tree_frame.add_parent_line_match(index, match.group())
-                self.test_box_frame.add_tag_full_match(index, match)
-
-                named_groups = {k: (match.start(k), match.end(k)) for k in match.groupdict()}
-                for g_index, group_match_str in enumerate(match.groups(), start=1):
-                    if match.start(g_index) != -1:  # -1 are non-matches
-                        # Get group name
-                        name = ' - (anonymous)'
-                        ks = []
-                        for k in named_groups:
-                            if named_groups[k] == (match.start(g_index), match.end(g_index)):
-                                name = f' - ({k})'
-                                ks.append(k)
-                                break  # Take first on perfectly overlapping named groups. Ex: (?P<a>(?P<b>test))
-                        [named_groups.pop(k) for k in ks]  # Update named_groups
-
-                        self.test_box_frame.add_tag_group(index, g_index, match)
-                        self.result_tree_frame.add_sub_line_match(s_tree, g_index, name, group_match_str)
-
-
-root = App()
-root.mainloop()
+        if self.profile is None:  # Not triggered by an edit
+            self.profile = start_profile(SETTINGS.profiling_enabled)
+        try:
+            with timed('compile'):
+                if self.top_bar_frame.rules_path is not None:
+                    engine = load_rule_set(self.top_bar_frame.rules_path, self.top_bar_frame.get_flags(),
+                                           self.top_bar_frame.get_mode())
+                elif pattern and self.top_bar_frame.comparing:
+                    engine = CompareEngine(
+                        MatchEngine(pattern, self.top_bar_frame.get_mode(), self.top_bar_frame.get_flags()),
+                        MatchEngine(self.top_bar_frame.get_regex_pattern_b(), self.top_bar_frame.get_mode(),
+                                    self.top_bar_frame.get_flags()))
+                elif pattern:
+                    engine = MatchEngine(pattern, self.top_bar_frame.get_mode(), self.top_bar_frame.get_flags())
+                else:
+                    engine = None
+        except (re.error, OverflowError, OSError, ValueError, KeyError, TypeError) as e:  # Broken patterns or rule sets
+            engine = None
+            self.debug_frame.show_error(e)
+
+        if engine and engine.mode != MODE_BUFFER and self._complete and engine.key == self._engine.key:
+            if dirty is not None:
+                first_line, last_line, line_delta = dirty
+                self.results.remove_lines(first_line, last_line - line_delta, line_delta)
+                self.result_tree_frame.remove_lines(first_line, last_line - line_delta, line_delta)
+                self.result_tree_frame.set_line_count(self.test_box_frame.test_textbox.get_total_line_n())
+                self._run(engine, range(first_line, last_line + 1),
+                          self.test_box_frame.test_textbox.get_lines(first_line, last_line))
+            else:
+                self._stop_profile()  # Nothing to evaluate
+            return
+
+        self.results.clear()
+        self.result_tree_frame.clear()
+        self.result_tree_frame.comparing = isinstance(engine, CompareEngine)
+        self.test_box_frame.schedule_highlight()
+        self._engine, self._complete = engine, False
+        if engine and not self._confirm_risks(engine):
+            self._stop_profile()
+            return
+        if engine and engine.mode == MODE_BUFFER:
+            self.result_tree_frame.set_line_count(self.test_box_frame.test_textbox.get_total_line_n())
+            self._filler = None  # Whole buffer results are not cached per line
+            self._submit(engine, None, self.source.text() if self.source is not None else
+                         self.test_box_frame.get_test_textbox_text())
+        elif engine:
+            lines = self.source.lines() if self.source is not None else self.test_box_frame.get_test_textbox_contents()
+            self.result_tree_frame.set_line_count(len(lines))
+            self._run(engine, range(1, len(lines) + 1), lines)
+        else:
+            self._stop_profile()
+
+    def _risks(self, engine: Union[MatchEngine, RuleSetEngine, CompareEngine]) -> tuple[Risk, ...]:
+        """ Static analysis of the engine's pattern, or of every rule """
+        flags = self.top_bar_frame.get_flags()
+        engines = engine.engines if isinstance(engine, (RuleSetEngine, CompareEngine)) else (engine,)
+        return tuple(risk for rule_engine in engines for risk in analyze(rule_engine.pattern.pattern, flags))
+
+    def _confirm_risks(self, engine: Union[MatchEngine, RuleSetEngine, CompareEngine]) -> bool:
+        """
+        Show the risks found in the pattern. If there are any and the test box is large, ask for confirmation first.
+        :return: bool, whether the evaluation can go ahead
+        """
+        risks = self._risks(engine)
+        self.debug_frame.show_risks(risks)
+        line_count = self.test_box_frame.test_textbox.get_total_line_n()
+        if not risks or not SETTINGS.risk_confirm_lines or line_count < SETTINGS.risk_confirm_lines or \
+                engine.key == self._confirmed_key:
+            return True
+        self.debug_frame.ask_confirmation(line_count, lambda: self.run_anyway(engine.key))
+        return False
+
+    def run_anyway(self, engine_key: tuple) -> None:
+        """ Evaluate a risky pattern the user confirmed """
+        self._confirmed_key = engine_key
+        self.evaluate()
+
+    def open_file(self, path: str) -> None:
+        """ Memory-map a file and load it into the test box, evaluating it once loaded """
+        if self.follower is not None:
+            self.debug_frame.show_error(ValueError('Stop following before opening a file.'))
+            return
+        try:
+            mapped = MappedFile(path)
+        except OSError as e:
+            self.debug_frame.show_error(e)
+            return
+        self._close_source()
+        self.source = mapped
+        if self._evaluation_job is not None:
+            self.after_cancel(self._evaluation_job)
+            self._evaluation_job = None
+        self._generation += 1
+        self._complete = False
+        self.results.clear()
+        self.result_tree_frame.clear()
+        self.test_box_frame.test_textbox.pop_dirty()
+        self.test_box_frame.load(mapped, self.evaluate)
+
+    def _close_source(self) -> None:
+        """ Stop reading from the file the test box was loaded from """
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def toggle_follow(self) -> None:
+        """ Start following the file picked in the top bar, replacing the test box contents, or stop following """
+        if self._follow_job is not None:
+            self.after_cancel(self._follow_job)
+            self._follow_job = None
+        if self.follower is not None:
+            self.follower.close()
+            self.follower = None
+        if self.top_bar_frame.follow_path is None:
+            return
+        try:
+            self.follower = FileFollower(self.top_bar_frame.follow_path)
+        except OSError as e:
+            self.debug_frame.show_error(e)
+            return
+        self.test_box_frame.cancel_load()  # Following replaces a file being loaded
+        self.test_box_frame.test_textbox.delete('1.0', END)
+        self.follow_poll()
+
+    def follow_poll(self) -> None:
+        """
+        Append the lines written to the followed file since the last poll, keeping the last follow_max_lines lines.
+        Only the appended lines are matched; results of evicted lines are dropped and the rest renumbered.
+        Waits while an evaluation is pending or running, the file buffering what was written meanwhile.
+        """
+        self._follow_job = self.after(SETTINGS.follow_interval_ms, self.follow_poll)
+        if self.worker.busy or self._evaluation_job is not None:
+            return
+        try:
+            lines = self.follower.poll()
+        except OSError as e:
+            self.debug_frame.show_error(e)
+            return
+        if not lines:
+            return
+
+        evicted, first_line = self.test_box_frame.append_lines(lines, SETTINGS.follow_max_lines)
+        if evicted:
+            self.results.remove_lines(1, evicted, -evicted)
+            self.result_tree_frame.remove_lines(1, evicted, -evicted)
+        last_line = self.test_box_frame.test_textbox.get_total_line_n()
+        self.result_tree_frame.set_line_count(last_line)
+        engine = self._engine
+        if engine is None or not self._complete:  # Nothing to match, or waiting on a confirmation
+            self.test_box_frame.schedule_highlight()
+        elif engine.mode == MODE_BUFFER:  # Matches may span the new lines, start over
+            self.evaluate()
+        else:
+            self._generation += 1
+            self._run(engine, range(first_line, last_line + 1), lines[-(last_line - first_line + 1):])
+
+    def _run(self, engine: MatchEngine, line_numbers: range, lines: list[str]) -> None:
+        """ Render the lines found in the cache, and submit the rest to the worker """
+        self._engine, self._complete = engine, False
+        hits, miss_numbers, misses = [], [], []
+        for line_number, line in zip(line_numbers, lines):
+            line_matches = self.cache.get(engine.key, line)
+            if line_matches is None:
+                miss_numbers.append(line_number)
+                misses.append(line)
+            else:
+                hits.extend((line_number, line_match) for line_match in line_matches)
+        self.re_get(hits)
+        if not misses:
+            self._filler = None
+            self._evaluation_done()
+            return
+
+        if len(misses) == len(lines):
+            miss_numbers = line_numbers  # Pickles compactly
+        self._filler = CacheFiller(self.cache, engine.key, miss_numbers, misses)
+        self._submit(engine, miss_numbers, misses)
+
+    def _submit(self, engine: MatchEngine, line_numbers: Optional[Sequence[int]],
+                lines: Union[list[str], str]) -> None:
+        """ Submit a job to the worker and poll it until done """
+        self.worker.submit(self._generation, engine, line_numbers, lines, profile=self.profile is not None)
+        if self._poll_job is None:
+            self._poll_job = self.after(_POLL_INTERVAL_MS, self.poll_worker)
+
+    def poll_worker(self) -> None:
+        """ Render results streamed back by the worker, and kill it if it runs past the time budget. """
+        self._poll_job = None
+        for kind, generation, payload in self.worker.poll():
+            if generation != self._generation:
+                continue
+            if kind == 'batch':
+                if self._filler is not None:
+                    self._filler.add(payload)
+                self.re_get(payload)
+            elif kind == 'done':
+                if self._filler is not None:
+                    self._filler.done()
+                    self._filler = None
+                if payload is not None and self.profile is not None:
+                    match_seconds, self.profile.lines = payload
+                    self.profile.add_timing('match', match_seconds)
+                self._evaluation_done()
+        timeout_message = self.worker.check_timeout(SETTINGS.evaluation_timeout_s)
+        if timeout_message:
+            self.debug_frame.show_error(TimeoutError(timeout_message))
+        if self.worker.busy:
+            self._poll_job = self.after(_POLL_INTERVAL_MS, self.poll_worker)
+
+    def _evaluation_done(self) -> None:
+        """ The last evaluation is complete, show its profile once its results are drawn """
+        self._complete = True
+        if self.profile is not None:
+            self.after_idle(self._show_profile, self.profile)
+            self.profile = None
+
+    def _show_profile(self, profile: EvaluationProfile) -> None:
+        """ Stop collecting into a finished profile, so later scrolls don't add to it, and show it """
+        stop_profile(profile)
+        self.debug_frame.show_profile(profile)
+
+    def _stop_profile(self) -> None:
+        """ Drop the current profile, the evaluation it was started for having nothing to draw """
+        stop_profile(self.profile)
+        self.profile = None
+
+    def re_get(self, results: list[tuple[int, LineMatch]]) -> None:
+        """ Store a batch of results, the test box and tree render them on idle. """
+        self.results.extend(results)
+        self.result_tree_frame.results_changed()
+        self.test_box_frame.schedule_highlight()
+
+    def destroy(self) -> None:
+        """ Stop the worker, and following, along with the window """
+        self.worker.close()
+        if self.follower is not None:
+            self.follower.close()
+        self._close_source()
+        super().destroy()
+
+
+def main(report_startup: bool = False) -> None:
+    """ Create the window and run the mainloop """
+    root = App(report_startup)
+    root.mainloop()
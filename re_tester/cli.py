@@ -0,0 +1,150 @@
+""" Command-line batch mode, matches files or stdin and writes results as JSON Lines """
+import argparse
+import codecs
+import json
+import multiprocessing
+import os
+import re
+import sys
+from collections import deque
+from itertools import islice
+from typing import Iterable, Iterator, TextIO
+
+from re_tester.engine import MatchEngine, LineMatch, MODE_FIRST, MODE_ALL
+
+_FLAGS = {'I': re.IGNORECASE, 'M': re.MULTILINE, 'S': re.DOTALL, 'X': re.VERBOSE, 'A': re.ASCII}
+
+# Engine of each pool process, set by _init_process
+_ENGINE: MatchEngine = None
+
+
+def _init_process(engine: MatchEngine) -> None:
+    """ Pool initializer, receives the engine once instead of once per chunk """
+    global _ENGINE  # pylint: disable=global-statement
+    _ENGINE = engine
+
+
+def _positive_int(value: str) -> int:
+    """ argparse type of the counts that must be at least 1 """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid int value: {value!r}') from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, got {number}')
+    return number
+
+
+def to_record(file_name: str, line_number: int, line_match: LineMatch) -> dict:
+    """ JSON-ready representation of a match """
+    return {
+        'file': file_name,
+        'line': line_number,
+        'span': list(line_match.span),
+        'match': line_match.text,
+        'groups': [{'index': group.index, 'name': group.name, 'span': list(group.span), 'match': group.text}
+                   for group in line_match.groups]
+    }
+
+
+def _match_chunk(chunk: tuple[str, int, list[str]]) -> list[str]:
+    """ Match a chunk of lines, returning its serialized records """
+    file_name, start, lines = chunk
+    return [json.dumps(to_record(file_name, line_number, line_match))
+            for line_number, line_match in _ENGINE.evaluate(lines, start=start)]
+
+
+def read_chunks(file_name: str, stream: TextIO, chunk_lines: int) -> Iterator[tuple[str, int, list[str]]]:
+    """
+    Read a stream in chunks of chunk_lines lines, yielding (file_name, first_line_number, lines). Lines end with '\n'
+    only, as grep counts them: the stream is opened with newline='\n', and a '\r' before it is stripped too.
+    """
+    start = 1
+    lines = (line[:-2] if line.endswith('\r\n') else line[:-1] if line.endswith('\n') else line for line in stream)
+    while True:
+        chunk = list(islice(lines, chunk_lines))
+        if not chunk:
+            return
+        yield file_name, start, chunk
+        start += len(chunk)
+
+
+def run(engine: MatchEngine, chunks: Iterable[tuple[str, int, list[str]]], output: TextIO, jobs: int) -> int:
+    """
+    Match every chunk and write the records in input order. At most 2 * jobs chunks are in flight, so memory stays
+    constant regardless of the input size.
+    :return: int, number of matches written
+    """
+    written = 0
+
+    def write(records: list[str]) -> None:
+        nonlocal written
+        output.writelines(f'{record}\n' for record in records)
+        written += len(records)
+
+    if jobs <= 1:
+        _init_process(engine)
+        for chunk in chunks:
+            write(_match_chunk(chunk))
+        return written
+
+    with multiprocessing.Pool(jobs, initializer=_init_process, initargs=(engine,)) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(_match_chunk, (chunk,)))
+            if len(in_flight) >= 2 * jobs:
+                write(in_flight.popleft().get())
+        while in_flight:
+            write(in_flight.popleft().get())
+    return written
+
+
+def main(argv: list[str] = None) -> int:
+    """ Entry-point of python -m re_tester """
+    parser = argparse.ArgumentParser(prog='python -m re_tester',
+                                     description='Match a pattern against files or stdin, writing JSON Lines.')
+    parser.add_argument('pattern', help='regular expression')
+    parser.add_argument('files', nargs='*', default=['-'], help="files to read, '-' for stdin (default)")
+    parser.add_argument('--mode', choices=(MODE_FIRST, MODE_ALL), default=MODE_FIRST,
+                        help='first match per line, or all matches per line')
+    parser.add_argument('--flags', default='', help='any of IMSXA')
+    parser.add_argument('--jobs', type=_positive_int, default=multiprocessing.cpu_count(), help='worker processes')
+    parser.add_argument('--chunk-lines', type=_positive_int, default=10000, help='lines per unit of work')
+    parser.add_argument('--encoding', default='utf-8', help='encoding of the input files')
+    args = parser.parse_args(argv)
+
+    flags = 0
+    for flag in args.flags.upper():
+        if flag not in _FLAGS:
+            parser.error(f'unknown flag: {flag}')
+        flags |= _FLAGS[flag]
+    try:
+        engine = MatchEngine(args.pattern, args.mode, flags)
+    except (re.error, OverflowError) as e:  # Repeat counts too large overflow
+        parser.error(f'invalid pattern: {e}')
+    try:
+        codecs.lookup(args.encoding)
+    except LookupError:
+        parser.error(f'unknown encoding: {args.encoding}')
+
+    written, failed = 0, False
+    try:
+        for file_name in args.files:
+            if file_name == '-':
+                sys.stdin.reconfigure(newline='\n')
+                written += run(engine, read_chunks(file_name, sys.stdin, args.chunk_lines), sys.stdout, args.jobs)
+                continue
+            try:
+                with open(file_name, 'r', encoding=args.encoding, errors='replace', newline='\n') as r_file:
+                    written += run(engine, read_chunks(file_name, r_file, args.chunk_lines), sys.stdout, args.jobs)
+            except BrokenPipeError:
+                raise
+            except OSError as e:  # Reported like grep does, the other files are still matched
+                print(f'{parser.prog}: {file_name}: {e.strerror}', file=sys.stderr)
+                failed = True
+        sys.stdout.flush()
+    except BrokenPipeError:  # The reader went away, as head does: stop quietly
+        # Python flushes stdout again on exit, point it at devnull so that doesn't fail too
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 2 if failed else 0 if written else 1
@@ -0,0 +1,41 @@
+""" A/B comparison of two versions of a pattern """
+from dataclasses import replace
+
+from re_tester.engine import MatchEngine, LineMatch, MODE_BUFFER
+
+# Rule given to the results of each pattern
+RULE_A = 'A'
+RULE_B = 'B'
+
+
+def _captures(line_matches: tuple[LineMatch, ...]) -> tuple:
+    """ What two versions of a pattern must agree on: the spans of every match and of its groups """
+    return tuple((line_match.span, tuple((group.index, group.span) for group in line_match.groups))
+                 for line_match in line_matches)
+
+
+class CompareEngine:
+    """
+    MatchEngine counterpart matching two versions of a pattern over the same lines, keeping only the lines whose
+    matches or group captures differ. Both are matched on each line in turn, so differences stream out as lines are
+    evaluated instead of after two full passes. The results of a differing line are those of A then those of B, told
+    apart by their rule.
+    """
+    def __init__(self, engine_a: MatchEngine, engine_b: MatchEngine):
+        if engine_a.mode == MODE_BUFFER:
+            raise ValueError('A/B comparison works line by line, pick another mode')
+        self.engines = [engine_a, engine_b]
+        self.mode = engine_a.mode
+
+    @property
+    def key(self) -> tuple:
+        """ Identifies the results this engine produces, for caching """
+        return 'compare', self.engines[0].key, self.engines[1].key
+
+    def match_line(self, line: str) -> tuple[LineMatch, ...]:
+        """ Match a single line with both patterns, return an empty tuple if they agree """
+        matches_a, matches_b = self.engines[0].match_line(line), self.engines[1].match_line(line)
+        if _captures(matches_a) == _captures(matches_b):
+            return ()
+        return tuple(replace(line_match, rule=RULE_A) for line_match in matches_a) + \
+            tuple(replace(line_match, rule=RULE_B) for line_match in matches_b)
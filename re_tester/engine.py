@@ -0,0 +1,248 @@
+""" Headless matching engine """
+import functools
+import hashlib
+import re
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import islice
+from mmap import mmap
+from typing import Hashable, Iterable, Iterator, Optional, Sequence, Union
+
+
+@dataclass(frozen=True)
+class GroupMatch:
+    """ A participating group of a line match """
+    index: int
+    name: Optional[str]
+    span: tuple[int, int]
+    text: str
+
+
+@dataclass(frozen=True)
+class LineMatch:
+    """ The full match of a line, and its participating groups """
+    span: tuple[int, int]
+    text: str
+    groups: tuple[GroupMatch, ...]
+    rule: Optional[str] = None  # Name of the rule that matched, when evaluating a rule set
+
+
+# Matching modes
+MODE_FIRST = 'first'  # First match of each line
+MODE_ALL = 'all'  # Every match of each line
+MODE_BUFFER = 'buffer'  # Every match over the whole text, matches may cross lines
+MODES = (MODE_FIRST, MODE_ALL, MODE_BUFFER)
+
+
+def line_starts(text: Union[str, bytes, mmap]) -> array:
+    """ Offset at which every line of text starts, in bytes if text is bytes-like (bytes, mmap) """
+    newline = '\n' if isinstance(text, str) else b'\n'
+    starts = array('q', [0])
+    find, position = text.find, text.find(newline)
+    while position != -1:
+        starts.append(position + 1)
+        position = find(newline, position + 1)
+    return starts
+
+
+class MatchEngine:
+    """
+    Compiles a pattern once and matches it against lines, returning plain result objects that know nothing
+    about the widgets rendering them.
+    Spans are offsets from the start of the line the match starts on, which a match may run past in MODE_BUFFER.
+    """
+    def __init__(self, pattern: str, mode: str = MODE_FIRST, flags: int = 0):
+        if mode not in MODES:
+            raise ValueError(f'Unknown mode: {mode}')
+        self.mode = mode
+        self.pattern = re.compile(pattern, flags)
+        # Group index -> name, anonymous groups are left as None
+        index_to_name = {index: name for name, index in self.pattern.groupindex.items()}
+        self.group_names: tuple[Optional[str], ...] = tuple(index_to_name.get(g_index)
+                                                            for g_index in range(self.pattern.groups + 1))
+
+    @property
+    def key(self) -> tuple[re.Pattern, str]:
+        """ Identifies the results this engine produces, for caching """
+        return self.pattern, self.mode
+
+    def match_line(self, line: str) -> tuple[LineMatch, ...]:
+        """ Match a single line, return an empty tuple if it does not match """
+        if self.mode == MODE_FIRST:
+            match = self.pattern.search(line)
+            return () if match is None else (self.to_line_match(match),)
+        return tuple(self.to_line_match(match) for match in self.pattern.finditer(line))
+
+    def evaluate(self, lines: Iterable[str], start: int = 1) -> Iterator[tuple[int, LineMatch]]:
+        """
+        Match every line, yielding (line_number, LineMatch) for each match
+        :param lines: Iterable[str], the lines to match
+        :param start: int, line number of the first line
+        """
+        match_line = self.match_line
+        for line_number, line in enumerate(lines, start=start):
+            for line_match in match_line(line):
+                yield line_number, line_match
+
+    def evaluate_buffer(self, text: str, starts: array = None) -> Iterator[tuple[int, LineMatch]]:
+        """
+        Run a single finditer over the whole text, yielding (line_number, LineMatch) for each match, line_number
+        being the line the match starts on.
+        :param text: str, the whole text
+        :param starts: array, line_starts(text), computed if not given
+        """
+        if starts is None:
+            starts = line_starts(text)
+        for match in self.pattern.finditer(text):
+            line_number = bisect_right(starts, match.start())
+            yield line_number, self.to_line_match(match, starts[line_number - 1])
+
+    def to_line_match(self, match: re.Match, offset: int = 0, group_offset: int = 0,
+                      rule: Optional[str] = None) -> LineMatch:
+        """
+        Convert a re.Match into a LineMatch, skipping non-participating groups
+        :param offset: int, subtracted from spans so they are relative to the start of the line
+        :param group_offset: int, where this engine's groups start in the match, when its pattern is embedded in
+        a larger one
+        :param rule: str, name of the rule that matched, if any
+        """
+        groups = []
+        for g_index in range(1, self.pattern.groups + 1):
+            g_start, g_end = match.span(g_index + group_offset)
+            if g_start != -1:  # -1 are non-matches
+                groups.append(GroupMatch(g_index, self.group_names[g_index], (g_start - offset, g_end - offset),
+                                         match.group(g_index + group_offset)))
+        if group_offset:
+            start, end = match.span(group_offset)
+            text = match.group(group_offset)
+        else:
+            start, end = match.span()
+            text = match.group()
+        return LineMatch((start - offset, end - offset), text, tuple(groups), rule)
+
+
+def _fingerprint(value: Hashable) -> bytes:
+    """ Bytes identifying an engine key, patterns standing for their source and flags """
+    if isinstance(value, re.Pattern):
+        value = (value.pattern, value.flags)
+    if isinstance(value, tuple):
+        return b'(' + b','.join(_fingerprint(item) for item in value) + b')'
+    return repr(value).encode('utf-8', errors='backslashreplace')
+
+
+@functools.lru_cache(maxsize=64)
+def _engine_digest(engine_key: Hashable) -> bytes:
+    """ Salt of the line digests of an engine """
+    return hashlib.blake2b(_fingerprint(engine_key), digest_size=16).digest()
+
+
+class ResultCache:
+    """
+    Least recently used cache of line results, keyed by a digest of (MatchEngine.key, line content) so lines are not
+    kept alive by the cache.
+    Results are kept compact, as packed spans and name ids without any text, which get() slices back from the line.
+    Entries live in a plain dict, half the size of an OrderedDict, ordered from least to most recently used. Once full
+    an eighth of it is evicted at once, so the slots the evicted entries leave at its start are skipped over rarely.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: dict[bytes, bytes] = {}
+        # Group and rule names, interned: entries refer to them by their index
+        self._names: list[Optional[str]] = [None]
+        self._name_ids: dict[Optional[str], int] = {None: 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(engine_key: Hashable, line: str) -> bytes:
+        """ Digest of a line, salted by the engine """
+        return hashlib.blake2b(line.encode('utf-8', errors='surrogatepass'), digest_size=16,
+                               salt=_engine_digest(engine_key)).digest()
+
+    def _name_id(self, name: Optional[str]) -> int:
+        """ Index of an interned name """
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return name_id
+
+    def get(self, engine_key: Hashable, line: str) -> Optional[tuple[LineMatch, ...]]:
+        """ Look a line up, return None on a miss """
+        key = self._key(engine_key, line)
+        try:
+            packed = self._entries[key]
+        except KeyError:
+            return None
+        self._entries[key] = self._entries.pop(key)  # Most recently used
+        result, names = array('i', packed), self._names
+        line_matches, i = [], 0
+        while i < len(result):
+            start, end, rule, group_count = result[i:i + 4]
+            groups = result[i + 4:i + 4 + 4 * group_count]
+            line_matches.append(LineMatch((start, end), line[start:end], tuple(
+                GroupMatch(index, names[name], (g_start, g_end), line[g_start:g_end])
+                for index, name, g_start, g_end in zip(groups[::4], groups[1::4], groups[2::4], groups[3::4])),
+                names[rule]))
+            i += 4 + 4 * group_count
+        return tuple(line_matches)
+
+    def put(self, engine_key: Hashable, line: str, result: tuple[LineMatch, ...]) -> None:
+        """ Store a line result, evicting the least recently used ones past max_size """
+        key = self._key(engine_key, line)
+        self._entries.pop(key, None)  # Inserted again as the most recently used
+        name_id = self._name_id
+        # Packed: start, end, rule, group count, then index, name, start, end of each group, for every match
+        values = []
+        for line_match in result:
+            values += (*line_match.span, name_id(line_match.rule), len(line_match.groups))
+            for group in line_match.groups:
+                values += (group.index, name_id(group.name), *group.span)
+        self._entries[key] = array('i', values).tobytes() if values else b''
+        if len(self._entries) > self.max_size:
+            for evicted in list(islice(self._entries, max(self.max_size // 8, len(self._entries) - self.max_size))):
+                del self._entries[evicted]
+
+    def clear(self) -> None:
+        """ Drop every entry """
+        self._entries.clear()
+
+
+class CacheFiller:
+    """
+    Caches the results of a job as its batches come in, non-matching lines included, so they need not be held until
+    the job is done. Batches follow the order of the lines, but the matches of a batch's last line may go on in the
+    next one: that line is only cached once a later line, or the end of the job, is reached.
+    """
+    def __init__(self, cache: ResultCache, engine_key: Hashable, line_numbers: Sequence[int], lines: list[str]):
+        self._cache = cache
+        self._engine_key = engine_key
+        self._line_numbers = line_numbers
+        self._lines = lines
+        self._skip = max(len(lines) - cache.max_size, 0)  # Earlier lines would be evicted right away
+        self._position = 0  # Of the next line to cache
+        self._line_number, self._line_matches = None, []  # Last line seen, and its matches so far
+
+    def add(self, batch: Iterable[tuple[int, LineMatch]]) -> None:
+        """ Cache the lines a batch completes """
+        for line_number, line_match in batch:
+            if line_number != self._line_number:
+                self._cache_until(line_number)
+                self._line_number, self._line_matches = line_number, []
+            self._line_matches.append(line_match)
+
+    def done(self) -> None:
+        """ Cache the lines left, the job being done """
+        self._cache_until(None)
+
+    def _cache_until(self, line_number: Optional[int]) -> None:
+        """ Cache the lines before line_number, every line left if None """
+        while self._position < len(self._lines) and (line_number is None or
+                                                      self._line_numbers[self._position] < line_number):
+            if self._position >= self._skip:
+                current = self._line_numbers[self._position]
+                self._cache.put(self._engine_key, self._lines[self._position],
+                                tuple(self._line_matches) if current == self._line_number else ())
+            self._position += 1
@@ -1,12 +1,31 @@
 """ Application's frames """
-from re import Match
-from tkinter import ttk, Entry, Frame, Label, Scrollbar, FLAT, LEFT, RIGHT, Y, BOTH, END, NONE, StringVar
+import json
+import os.path
+import re
+from typing import Callable, Optional
+from tkinter import ttk, Entry, Frame, Label, Scrollbar, OptionMenu, Checkbutton, FLAT, LEFT, RIGHT, TOP, X, Y, BOTH, \
+    END, NONE, INSERT, StringVar, BooleanVar
+from tkinter import filedialog
+from tkinter.font import nametofont
 from re_tester.widgets import CustomText, LeftLineNumbersBar
 from re_tester.settings import SETTINGS
+from re_tester.engine import MODE_FIRST, MODE_ALL, MODE_BUFFER
+from re_tester.results import ResultStore
+from re_tester.profiling import EvaluationProfile, profiled
+from re_tester.analysis import Risk
+from re_tester.mapped import MappedFile
+
+# Lines above and below the viewport that get highlighted too, so small scrolls don't show untagged text
+_HIGHLIGHT_MARGIN_LINES = 50
+# Lines inserted per idle callback when loading a file into the test box
+_LOAD_CHUNK_LINES = 20000
 
 
 class TopBarFrame(Frame):
     """ Top bar frame """
+    MODE_LABELS = {MODE_FIRST: 'first per line', MODE_ALL: 'all per line', MODE_BUFFER: 'whole buffer'}
+    FLAGS = {re.IGNORECASE: 'I', re.MULTILINE: 'M', re.DOTALL: 'S', re.VERBOSE: 'X', re.ASCII: 'A'}
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config(background=SETTINGS.default_background)
@@ -26,19 +45,165 @@ class TopBarFrame(Frame):
             highlightcolor=SETTINGS.topbar_frame_background_color,
             highlightbackground=SETTINGS.topbar_frame_background_color,
         )
+
+        # Second version of the pattern, compared against the first when shown
+        self.comparing = False
+        self.compare_button = Label(self, text='A/B',
+                                    font=SETTINGS.font,
+                                    background=SETTINGS.topbar_frame_background_color,
+                                    foreground=SETTINGS.default_foreground)
+        self.regex_b_string = StringVar()
+        self.regex_b_text_box = Entry(self, textvariable=self.regex_b_string)
+        self.regex_b_text_box.config(
+            relief=FLAT,
+            font=SETTINGS.font,
+            foreground=SETTINGS.topbar_frame_foreground_color,
+            insertbackground=SETTINGS.topbar_frame_cursor_color,
+            background=SETTINGS.topbar_frame_background_color,
+            highlightcolor=SETTINGS.topbar_frame_background_color,
+            highlightbackground=SETTINGS.topbar_frame_background_color,
+        )
+
+        # Matching mode and flags
+        self.mode_string = StringVar(value=self.MODE_LABELS[MODE_FIRST])
+        self.mode_menu = OptionMenu(self, self.mode_string, *self.MODE_LABELS.values())
+        self.mode_menu.config(relief=FLAT, highlightthickness=0,
+                              background=SETTINGS.topbar_frame_background_color,
+                              foreground=SETTINGS.default_foreground,
+                              activebackground=SETTINGS.topbar_frame_background_color,
+                              activeforeground=SETTINGS.topbar_frame_foreground_color)
+        self.flag_vars = {flag: BooleanVar(value=False) for flag in self.FLAGS}
+        self.flag_buttons = [Checkbutton(self, text=label, variable=self.flag_vars[flag], relief=FLAT,
+                                         highlightthickness=0,
+                                         background=SETTINGS.topbar_frame_background_color,
+                                         foreground=SETTINGS.default_foreground,
+                                         activebackground=SETTINGS.topbar_frame_background_color,
+                                         activeforeground=SETTINGS.topbar_frame_foreground_color,
+                                         selectcolor=SETTINGS.topbar_frame_background_color)
+                             for flag, label in self.FLAGS.items()]
+
+        # Rule set, replaces the pattern when loaded
+        self.rules_path = None
+        self.rules_button = Label(self, text='rules...',
+                                  font=SETTINGS.font,
+                                  background=SETTINGS.topbar_frame_background_color,
+                                  foreground=SETTINGS.default_foreground)
+
+        self.open_button = Label(self, text='open...',
+                                 font=SETTINGS.font,
+                                 background=SETTINGS.topbar_frame_background_color,
+                                 foreground=SETTINGS.default_foreground)
+
+        # File followed into the test box
+        self.follow_path = None
+        self.follow_button = Label(self, text='follow...',
+                                   font=SETTINGS.font,
+                                   background=SETTINGS.topbar_frame_background_color,
+                                   foreground=SETTINGS.default_foreground)
+
         self.regex_label.pack(side=LEFT, fill=Y)
         self.regex_text_box.pack(side=LEFT, fill=BOTH, expand=True)
+        self.compare_button.pack(side=LEFT, fill=Y)
+        self.follow_button.pack(side=RIGHT, fill=Y)
+        self.open_button.pack(side=RIGHT, fill=Y)
+        self.rules_button.pack(side=RIGHT, fill=Y)
+        for flag_button in reversed(self.flag_buttons):
+            flag_button.pack(side=RIGHT, fill=Y)
+        self.mode_menu.pack(side=RIGHT, fill=Y)
 
     def get_regex_pattern(self) -> str:
         """ Get the regex pattern in self.regex_text_box """
         return self.regex_text_box.get()
 
+    def get_regex_pattern_b(self) -> str:
+        """ Get the pattern compared against the one in self.regex_text_box """
+        return self.regex_b_text_box.get()
+
+    def get_mode(self) -> str:
+        """ Get the selected matching mode """
+        return next(mode for mode, label in self.MODE_LABELS.items() if label == self.mode_string.get())
+
+    def get_flags(self) -> int:
+        """ Get the selected flags, OR-ed together """
+        flags = 0
+        for flag, flag_var in self.flag_vars.items():
+            if flag_var.get():
+                flags |= flag
+        return flags
+
+    def bind_rules(self, callback) -> None:
+        """ Ask for a rule set file when clicking the rules button, or unload the current one, then call callback """
+        def on_click(_):
+            if self.rules_path is None:
+                self.rules_path = filedialog.askopenfilename(filetypes=[('Rule sets', '*.json *.txt'),
+                                                                        ('All files', '*')]) or None
+            else:
+                self.rules_path = None
+            if self.rules_path is None:
+                self.rules_button.config(text='rules...')
+                self.regex_text_box.config(state='normal')
+            else:
+                self.rules_button.config(text=f'rules: {os.path.basename(self.rules_path)} (x)')
+                self.regex_text_box.config(state='disabled')
+            callback()
+        self.rules_button.bind('<Button-1>', on_click)
+
+    def bind_compare(self, callback) -> None:
+        """ Show or hide the second pattern slot when clicking the A/B button, then call callback """
+        def on_click(_):
+            self.comparing = not self.comparing
+            if self.comparing:
+                self.regex_b_text_box.pack(side=LEFT, fill=BOTH, expand=True, after=self.compare_button)
+                self.compare_button.config(text='A/B (x) B:')
+                self.regex_b_text_box.focus_set()
+            else:
+                self.regex_b_text_box.pack_forget()
+                self.compare_button.config(text='A/B')
+            callback()
+        self.compare_button.bind('<Button-1>', on_click)
+
+    def bind_open(self, callback) -> None:
+        """ Ask for a file to load into the test box when clicking the open button, then call callback with its path """
+        def on_click(_):
+            path = filedialog.askopenfilename(filetypes=[('Text files', '*.txt *.log'), ('All files', '*')])
+            if path:
+                callback(path)
+        self.open_button.bind('<Button-1>', on_click)
+
+    def bind_follow(self, callback) -> None:
+        """ Ask for a file to follow when clicking the follow button, or stop following, then call callback """
+        def on_click(_):
+            if self.follow_path is None:
+                self.follow_path = filedialog.askopenfilename(filetypes=[('Logs', '*.log *.txt'),
+                                                                         ('All files', '*')]) or None
+            else:
+                self.follow_path = None
+            if self.follow_path is None:
+                self.follow_button.config(text='follow...')
+            else:
+                self.follow_button.config(text=f'following: {os.path.basename(self.follow_path)} (x)')
+            callback()
+        self.follow_button.bind('<Button-1>', on_click)
+
+    def trace_options(self, callback) -> None:
+        """ Call callback whenever the mode or a flag changes """
+        self.mode_string.trace_add("write", lambda x, y, z: callback())
+        for flag_var in self.flag_vars.values():
+            flag_var.trace_add("write", lambda x, y, z: callback())
+
 
 class TestBoxFrame(Frame):
-    """ Test box frame """
-    def __init__(self, *args, **kwargs):
+    """
+    Test box frame.
+    Only the lines in the viewport, plus a margin, are highlighted; highlighting follows scrolling.
+    """
+    def __init__(self, store: ResultStore, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config(background=SETTINGS.default_background)
+        self.store = store
+        self._load_job = None
+        self._highlight_job = None
+        self._highlighted_view = None  # (top, bottom) indexes in view when last highlighted
         self.test_textbox_line_numbers = LeftLineNumbersBar(self)
         self.test_textbox = CustomText(self)
         self.test_textbox.config(
@@ -62,13 +227,15 @@ class TestBoxFrame(Frame):
                                                 troughcolor=SETTINGS.default_background,
                                                 relief=FLAT
                                                 )
-        self.test_textbox.config(yscrollcommand=self.test_textbox_scrollbar.set)
+        self.test_textbox.config(yscrollcommand=self._on_yscroll)
+        # Growing the window shows more lines without necessarily scrolling
+        self.test_textbox.bind('<Configure>', lambda e: self._on_view_change())
 
         self.test_textbox_line_numbers.pack(side=LEFT, fill=Y)
         self.test_textbox.pack(side=LEFT, fill=BOTH, expand=True)
         self.test_textbox_scrollbar.pack(side=RIGHT, fill=Y)
 
-        self._init_tags()
+        self._tags = []  # Configured on the first highlight, after the window is shown
 
     def _init_tags(self):
         self.test_textbox.tag_config('full_match', background=SETTINGS.full_match_color)
@@ -76,49 +243,169 @@ class TestBoxFrame(Frame):
                                      foreground=SETTINGS.no_more_groups_match_foreground)
         for group_index, group_color in enumerate(SETTINGS.group_match_colors, start=1):
             self.test_textbox.tag_config(f'group_{group_index}', background=group_color)
+        self._tags = ['full_match', 'no_more_groups'] + [f'group_{group_index}' for group_index in
+                                                         range(1, len(SETTINGS.group_match_colors) + 1)]
+
+    def _on_yscroll(self, first: str, last: str):
+        """ Update the scrollbar and line numbers, and the highlighting if the view moved to other lines """
+        self.test_textbox_scrollbar.set(first, last)
+        self.test_textbox_line_numbers.draw_line_numbers(self.test_textbox)
+        self._on_view_change()
+
+    def _view(self) -> tuple[str, str]:
+        """ Indexes of the top and bottom lines in view """
+        return self.test_textbox.index('@0,0'), self.test_textbox.index(f'@0,{self.test_textbox.winfo_height()}')
+
+    def _on_view_change(self):
+        """ Highlight again if lines the last highlighting didn't cover may be in view """
+        if self._view() != self._highlighted_view:
+            self.schedule_highlight()
+
+    def schedule_highlight(self):
+        """ Coalesce highlight requests into one on idle """
+        if self._highlight_job is None:
+            self._highlight_job = self.after_idle(self.highlight)
 
-    def add_tag_full_match(self, index: int, match: Match):
-        """ Tag a full match """
-        pos = '{}+{}c'.format(f'{index}.{match.start()}', match.end() - match.start())
-        self.test_textbox.tag_add('full_match', f'{index}.{match.start()}', pos)
+    @profiled('tag')
+    def highlight(self):
+        """
+        Tag the matches in the viewport, plus a margin, sending all the ranges of each tag in a single tag_add call.
+        """
+        self._highlight_job = None
+        if not self._tags:
+            self._init_tags()
+        self._highlighted_view = top, bottom = self._view()
+        first_line = max(1, self.test_textbox.index_to_line_n(top) - _HIGHLIGHT_MARGIN_LINES)
+        last_line = self.test_textbox.index_to_line_n(bottom) + _HIGHLIGHT_MARGIN_LINES
 
-    def add_tag_group(self, index: int, group_index: int, match: Match):
-        """ Tag a group """
-        tag_name = f'group_{group_index}' if f'group_{group_index}' in self.test_textbox.tag_names() else \
-            'no_more_groups'
-        pos = '{}+{}c'.format(f'{index}.{match.start(group_index)}', match.end(group_index) - match.start(group_index))
-        self.test_textbox.tag_add(tag_name, f'{index}.{match.start(group_index)}', pos)
+        ranges = {tag: [] for tag in self._tags}
+        group_tag_count = len(SETTINGS.group_match_colors)
+        for position in range(self.store.position(first_line), self.store.position(last_line + 1)):
+            index = self.store.lines[position]
+            # Offsets are counted from the start of the line, a whole buffer match may run past its end
+            start, end = self.store.span(position)
+            ranges['full_match'] += (f'{index}.0+{start}c', f'{index}.0+{end}c')
+            for group_index, _, start, end in self.store.groups(position):
+                tag_name = f'group_{group_index}' if group_index <= group_tag_count else 'no_more_groups'
+                ranges[tag_name] += (f'{index}.0+{start}c', f'{index}.0+{end}c')
+
+        for tag in self._tags:
+            self.test_textbox.tag_remove(tag, '1.0', END)
+            if ranges[tag]:
+                self.test_textbox.tag_add(tag, *ranges[tag])
 
     def get_test_textbox_contents(self) -> list[str]:
         """ Returns contents of test_textbox """
         return self.test_textbox.get_all_lines()
 
+    def get_match_text(self, line: int, start: int, end: int) -> str:
+        """ Returns the text of a match, start and end being offsets from the start of the line """
+        return self.test_textbox.get(f'{line}.0+{start}c', f'{line}.0+{end}c')
+
+    def get_test_textbox_text(self) -> str:
+        """ Returns contents of test_textbox as a single string """
+        return self.test_textbox.get('1.0', 'end-1c')
+
+    def append_lines(self, lines: list[str], max_lines: int) -> tuple[int, int]:
+        """
+        Append lines without reporting the edit, evicting the oldest ones to keep at most max_lines.
+        Follows the end of the text if it was in view.
+        :return: tuple[int, int] (evicted_line_count, first_appended_line), in the numbering after the edit
+        """
+        textbox = self.test_textbox
+        lines = lines[-max_lines:]
+        at_bottom = textbox.yview()[1] >= 1.0
+        with textbox.quiet():
+            evicted = max(textbox.get_total_line_n() + len(lines) - max_lines, 0)
+            if evicted:
+                textbox.delete('1.0', f'{evicted + 1}.0')
+            empty = textbox.compare('end-1c', '==', '1.0')
+            textbox.insert('end-1c', ('' if empty else '\n') + '\n'.join(lines))
+        textbox.edit_reset()  # Appends are not undoable, and would pile up in the undo stack
+        if at_bottom:
+            textbox.see(END)
+        self.text_was_modified()
+        return evicted, textbox.get_total_line_n() - len(lines) + 1
+
+    @property
+    def loading(self) -> bool:
+        """ Whether a file is being loaded """
+        return self._load_job is not None
+
+    def load(self, mapped: MappedFile, on_done: Callable[[], None]) -> None:
+        """
+        Replace the contents with a mapped file, inserting it in chunks over idle callbacks so the UI stays responsive.
+        The edits are not reported, on_done is called once everything is in. The test box is read-only meanwhile.
+        """
+        textbox = self.test_textbox
+        self.cancel_load()
+        with textbox.quiet():
+            textbox.delete('1.0', END)
+
+        def insert_chunk(first_line: int) -> None:
+            self._load_job = None
+            textbox.config(state='normal')
+            try:
+                last_line = min(first_line + _LOAD_CHUNK_LINES - 1, len(mapped))
+                if not mapped.changed:  # Else truncated meanwhile, stop with what was loaded
+                    with textbox.quiet():
+                        textbox.insert('end-1c', mapped.text(first_line, last_line) +
+                                       ('\n' if last_line < len(mapped) else ''))
+                    self.text_was_modified()
+                    if last_line < len(mapped):
+                        self._load_job = self.after_idle(insert_chunk, last_line + 1)
+                        return
+            finally:
+                if self._load_job is not None:
+                    textbox.config(state='disabled')  # Until the next chunk, left editable if loading failed
+            textbox.edit_reset()
+            textbox.mark_set(INSERT, '1.0')
+            on_done()
+
+        textbox.config(state='disabled')
+        self._load_job = self.after_idle(insert_chunk, 1)
+
+    def cancel_load(self) -> None:
+        """ Stop loading a file, leaving what was inserted so far """
+        if self._load_job is not None:
+            self.after_cancel(self._load_job)
+            self._load_job = None
+            self.test_textbox.config(state='normal')
+
     def text_was_modified(self):
-        """ Draw line numbers and remove all tags from test_textbox """
+        """ Draw line numbers """
         self.test_textbox_line_numbers.draw_line_numbers(self.test_textbox)
-        self.test_textbox.remove_all_tags()
-        self._init_tags()  # Recreate tags.
 
 
 class ResultsTreeFrame(Frame):
-    """ Test box frame """
-    def __init__(self, *args, **kwargs):
+    """
+    Test box frame.
+    Virtualized: results live in a ResultStore and only the rows in the viewport are materialized as tree items, their
+    text being sliced from the source when displayed.
+    Clicking a full match row expands or collapses its groups.
+    """
+    def __init__(self, store: ResultStore, source: Callable[[int, int, int], str], *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config(background=SETTINGS.default_background)
+        self._row_height = nametofont('TkDefaultFont').metrics('linespace') + 4
         self.result_tree_style = ttk.Style()
         self.result_tree_style.configure("Treeview",
                                          background=SETTINGS.results_tree_frame_background_color,
                                          foreground=SETTINGS.results_tree_frame_foreground_color,
                                          fieldbackground=SETTINGS.results_tree_frame_background_color,
                                          relief=FLAT,
-                                         borderwidth=0
+                                         borderwidth=0,
+                                         rowheight=self._row_height
                                          )
 
         # Disable selected style
         self.result_tree_style.map("Treeview", background=[('selected', SETTINGS.default_background)],
                                    foreground=[('selected', SETTINGS.default_foreground)])
+        self.result_summary = Label(self, anchor='w',
+                                    background=SETTINGS.results_tree_frame_background_color,
+                                    foreground=SETTINGS.results_tree_frame_foreground_color)
         self.result_tree = ttk.Treeview(self, height=10, style="Treeview", show="tree", selectmode=NONE)
-        self.result_tree_scrollbar = Scrollbar(self, command=self.result_tree.yview,
+        self.result_tree_scrollbar = Scrollbar(self, command=self.yview,
                                                bd=1,
                                                background=SETTINGS.results_tree_frame_background_color,
                                                highlightcolor=SETTINGS.results_tree_frame_background_color,
@@ -128,10 +415,26 @@ class ResultsTreeFrame(Frame):
                                                relief=FLAT,
                                                )
 
-        self.result_tree.config(yscrollcommand=self.result_tree_scrollbar.set)
+        self.result_summary.pack(side=TOP, fill=X)
         self.result_tree.pack(side=LEFT, fill=BOTH, expand=True)
         self.result_tree_scrollbar.pack(side=RIGHT, fill=Y)
 
+        self.store = store
+        self.source = source  # (line, start, end) -> match text
+        self.line_count = 0
+        self.comparing = False  # Results are the differences between two patterns
+        self._expanded: set[int] = set()  # Line numbers whose matches show their groups
+        self._top_row = 0
+        self._visible_rows = 10
+        self._item_rows: dict[str, tuple[int, int]] = {}  # Materialized item -> (store position, group position)
+        self._refresh_job = None
+
+        self.result_tree.bind('<Configure>', self._on_configure)
+        self.result_tree.bind('<Button-1>', self._on_click)
+        self.result_tree.bind('<MouseWheel>', lambda e: self._on_wheel(-1 if e.delta > 0 else 1))
+        self.result_tree.bind('<Button-4>', lambda e: self._on_wheel(-1))
+        self.result_tree.bind('<Button-5>', lambda e: self._on_wheel(1))
+
         self._init_tags()
 
     def _init_tags(self):
@@ -141,22 +444,149 @@ class ResultsTreeFrame(Frame):
         for group_index, group_color in enumerate(SETTINGS.group_match_colors, start=1):
             self.result_tree.tag_configure(f'group_{group_index}', foreground=group_color)
 
-    def add_parent_line_match(self, index: int, match: str) -> str:
-        """ Add a root item to tree """
-        return self.result_tree.insert("", END, text=f'Line: {index} - Full match: "{match}"',
-                                                 tags="full", open=True)
+    def set_line_count(self, line_count: int):
+        """ Set the number of lines evaluated, shown on the summary """
+        self.line_count = line_count
+        self._schedule_refresh()
 
-    def add_sub_line_match(self, parent_index: str, group_index: int, group_name: str, match: str):
-        """ Add a children item to tree """
-        tag_name = f'group_{group_index}' if self.result_tree.tag_configure(f'group_{group_index}')['foreground'] else \
-            'no_more_groups'
-        self.result_tree.insert(parent_index, END, text=f'Group: {group_index}{group_name}: "{match}"',
-                                tags=tag_name)
+    def remove_lines(self, first_line: int, last_line: int, line_delta: int):
+        """
+        Forget the expanded state of lines first_line..last_line, removed from the store, and renumber the ones after
+        :param line_delta: int, how many lines were added (or removed if negative) in that range
+        """
+        self._expanded = {line + line_delta if line > last_line else line
+                          for line in self._expanded if not first_line <= line <= last_line}
+        self._schedule_refresh()
 
     def clear(self):
-        """ Delete all results on self.result_tree """
-        for rt in self.result_tree.get_children(""):
-            self.result_tree.delete(rt)
+        """ Reset the view, the store having been cleared """
+        self._expanded.clear()
+        self._top_row = 0
+        self.line_count = 0
+        self._schedule_refresh()
+
+    def results_changed(self):
+        """ The store changed, refresh on idle """
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        """ Coalesce refreshes requested while processing a batch of results """
+        if self._refresh_job is None:
+            self._refresh_job = self.after_idle(self.refresh)
+
+    def _total_rows(self) -> int:
+        """ Number of rows, counting the groups of expanded lines """
+        return len(self.store) + sum(self.store.group_count(position) for position in self._expanded_positions())
+
+    def _expanded_positions(self) -> list[int]:
+        """ Sorted store positions of the expanded lines """
+        return sorted(position for line in self._expanded for position in self.store.positions(line))
+
+    def _locate(self, row: int) -> tuple[int, int]:
+        """
+        Map a row to the result it displays
+        :return: tuple[int, int] (store position, group position), group position being -1 for full match rows
+        """
+        extra_rows = 0
+        for position in self._expanded_positions():
+            if row <= position + extra_rows:
+                break
+            group_count = self.store.group_count(position)
+            if row <= position + extra_rows + group_count:
+                return position, row - position - extra_rows - 1
+            extra_rows += group_count
+        return row - extra_rows, -1
+
+    @profiled('tree')
+    def refresh(self):
+        """ Materialize the rows in the viewport, and update the summary and scrollbar """
+        self._refresh_job = None
+        total_rows = self._total_rows()
+        self._top_row = max(0, min(self._top_row, total_rows - self._visible_rows))
+        self.result_tree.delete(*self._item_rows)
+        self._item_rows = {}
+
+        if total_rows:
+            position, group_position = self._locate(self._top_row)
+            for _ in range(min(self._visible_rows + 1, total_rows - self._top_row)):
+                line_number = self.store.lines[position]
+                if group_position == -1:
+                    item = self._render_parent_row(position)
+                else:
+                    item = self._render_group_row(line_number, self.store.groups(position)[group_position])
+                self._item_rows[item] = (position, group_position)
+                # Next row
+                if line_number in self._expanded and group_position + 1 < self.store.group_count(position):
+                    group_position += 1
+                else:
+                    position, group_position = position + 1, -1
+
+            self.result_tree_scrollbar.set(self._top_row / total_rows,
+                                           min(self._top_row + self._visible_rows, total_rows) / total_rows)
+        else:
+            self.result_tree_scrollbar.set(0, 1)
+        if self.comparing:
+            summary = f'{self.store.distinct_lines} of {self.line_count} lines differ'
+        else:
+            summary = f'{len(self.store)} matches in {self.line_count} lines'
+        if self.store.rule_counts:
+            summary += ' - hits: ' + ', '.join(f'{rule}: {count}' for rule, count in self.store.rule_counts.items()
+                                               if count)
+        self.result_summary.config(text=summary)
+
+    def _render_parent_row(self, position: int) -> str:
+        """ Add a full match item to tree """
+        index, rule = self.store.lines[position], self.store.rule(position)
+        marker = ('- ' if index in self._expanded else '+ ') if self.store.group_count(position) else '  '
+        rule = f' - Rule: {rule}' if rule is not None else ''
+        match = self.source(index, *self.store.span(position))
+        text = f'{marker}Line: {index}{rule} - Full match: "{self._escape(match)}"'
+        return self.result_tree.insert("", END, text=text, tags="full")
+
+    def _render_group_row(self, index: int, group: tuple[int, Optional[str], int, int]) -> str:
+        """ Add a group item to tree """
+        group_index, group_name, start, end = group
+        tag_name = f'group_{group_index}' if group_index <= len(SETTINGS.group_match_colors) else 'no_more_groups'
+        name = f' - ({group_name})' if group_name else ' - (anonymous)'
+        match = self.source(index, start, end)
+        return self.result_tree.insert("", END, text=f'      Group: {group_index}{name}: "{self._escape(match)}"',
+                                       tags=tag_name)
+
+    @staticmethod
+    def _escape(match: str) -> str:
+        """ Keep whole buffer matches on a single row """
+        return match.replace('\n', '\\n')
+
+    def yview(self, *args):
+        """ Scrollbar command, scrolls the virtual rows """
+        total_rows = self._total_rows()
+        if args[0] == 'moveto':
+            self._top_row = int(float(args[1]) * total_rows)
+        elif args[0] == 'scroll':
+            step = self._visible_rows if args[2] == 'pages' else 1
+            self._top_row += int(args[1]) * step
+        self.refresh()
+
+    def _on_wheel(self, units: int):
+        """ Scroll the virtual rows instead of the materialized ones """
+        self.yview('scroll', units, 'units')
+        return 'break'
+
+    def _on_configure(self, event):
+        """ Recompute how many rows fit in the viewport """
+        self._visible_rows = max(1, event.height // self._row_height)
+        self._schedule_refresh()
+
+    def _on_click(self, event):
+        """ Toggle the groups of the clicked full match row """
+        item = self.result_tree.identify_row(event.y)
+        if item in self._item_rows:
+            position, group_position = self._item_rows[item]
+            line_number = self.store.lines[position]
+            if group_position == -1 and self.store.group_count(position):
+                self._expanded ^= {line_number}
+                self.refresh()
+        return 'break'
 
 
 class DebugFrame(Frame):
@@ -173,6 +603,42 @@ class DebugFrame(Frame):
                                   highlightbackground=SETTINGS.debug_frame_background_color,
                                   relief=FLAT
                                   )
+
+        # Expandable profile panel, only shown when profiling is enabled
+        self.profile = None
+        self.profile_bar = Frame(self, background=SETTINGS.debug_frame_background_color)
+        self.profile_toggle = Label(self.profile_bar, text='+ Profile', anchor='w',
+                                    background=SETTINGS.debug_frame_background_color,
+                                    foreground=SETTINGS.default_foreground)
+        self.profile_export = Label(self.profile_bar, text='Export JSON',
+                                    background=SETTINGS.debug_frame_background_color,
+                                    foreground=SETTINGS.default_foreground)
+        self.profile_textbox = CustomText(self, height=4)
+        self.profile_textbox.config(
+                                    font=SETTINGS.font,
+                                    background=SETTINGS.debug_frame_background_color,
+                                    foreground=SETTINGS.default_foreground,
+                                    highlightcolor=SETTINGS.debug_frame_background_color,
+                                    highlightbackground=SETTINGS.debug_frame_background_color,
+                                    relief=FLAT
+                                    )
+        self.profile_toggle.bind('<Button-1>', lambda e: self.toggle_profile())
+        self.profile_export.bind('<Button-1>', lambda e: self.export_profile())
+
+        # Static analysis warnings, and the confirmation risky patterns need before a large evaluation
+        self.risk_bar = Frame(self, background=SETTINGS.debug_frame_background_color)
+        self.risk_label = Label(self.risk_bar, anchor='w', justify=LEFT,
+                                background=SETTINGS.debug_frame_background_color,
+                                foreground=SETTINGS.default_foreground)
+        self.confirm_button = Label(self.risk_bar, text='Run anyway',
+                                    background=SETTINGS.debug_frame_background_color,
+                                    foreground=SETTINGS.debug_frame_foreground_color)
+        self.risk_label.pack(side=LEFT, fill=X, expand=True)
+
+        if SETTINGS.profiling_enabled:
+            self.profile_toggle.pack(side=LEFT, fill=X, expand=True)
+            self.profile_export.pack(side=RIGHT)
+            self.profile_bar.pack(side=TOP, fill=X)
         self.debug_textbox.pack(side=LEFT, fill=BOTH, expand=True)
 
     def show_error(self, error: Exception):
@@ -180,5 +646,46 @@ class DebugFrame(Frame):
         self.debug_textbox.insert('1.0', f'{error}')
 
     def clear(self):
-        """ Delete all text on self.debug_textbox """
+        """ Delete all text on self.debug_textbox, and withdraw any pending confirmation """
         self.debug_textbox.delete('1.0', END)
+        self.confirm_button.pack_forget()
+
+    def show_risks(self, risks: tuple[Risk, ...]):
+        """ Show the risks found in the pattern, hide the bar if there are none """
+        if not risks:
+            self.risk_bar.pack_forget()
+            self.confirm_button.pack_forget()
+            return
+        self.risk_label.config(text='\n'.join(str(risk) for risk in risks))
+        if not self.risk_bar.winfo_ismapped():
+            self.risk_bar.pack(side=TOP, fill=X, before=self.debug_textbox)
+
+    def ask_confirmation(self, lines: int, callback: Callable[[], None]):
+        """ Hold back evaluating a risky pattern over many lines until 'Run anyway' is clicked """
+        self.show_error(UserWarning(f'Risky pattern, not evaluated over {lines} lines until confirmed.'))
+        self.confirm_button.bind('<Button-1>', lambda e: (self.confirm_button.pack_forget(), callback()))
+        self.confirm_button.pack(side=RIGHT)
+
+    def show_profile(self, profile: EvaluationProfile):
+        """ Replace the contents of the profile panel """
+        self.profile = profile
+        self.profile_textbox.delete('1.0', END)
+        self.profile_textbox.insert('1.0', profile.summary())
+
+    def toggle_profile(self):
+        """ Expand or collapse the profile panel """
+        if self.profile_textbox.winfo_ismapped():
+            self.profile_textbox.pack_forget()
+            self.profile_toggle.config(text='+ Profile')
+        else:
+            self.profile_textbox.pack(side=TOP, fill=X, after=self.profile_bar)
+            self.profile_toggle.config(text='- Profile')
+
+    def export_profile(self):
+        """ Save the last profile as JSON """
+        if self.profile is None:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[('JSON', '*.json')])
+        if path:
+            with open(path, 'w', encoding='utf-8') as w_file:
+                json.dump(self.profile.to_json(), w_file, indent=4)
@@ -0,0 +1,56 @@
+""" Memory-mapped input files """
+import mmap
+import os
+
+from re_tester.engine import line_starts
+
+
+class MappedFile:
+    """
+    A file memory-mapped for reading, with the byte offset at which each line starts. Lines are decoded on demand, so
+    the file is never held in memory as a whole. Line numbering follows the Text widget: a trailing newline makes for
+    a last, empty line. Lines ending in '\\r\\n' are read without the '\\r', as FileFollower and the CLI do.
+    The encoding must keep '\\n' a single byte, as UTF-8 and Latin-1 do; undecodable bytes are replaced.
+    """
+    def __init__(self, path: str, encoding: str = 'utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self._file = open(path, 'rb')  # pylint: disable=consider-using-with
+        if os.fstat(self._file.fileno()).st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = b''  # Empty files can't be mapped
+        self.starts = line_starts(self._map)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def changed(self) -> bool:
+        """ Whether the file no longer has the size it was mapped with, as after a truncation or copytruncate """
+        return os.fstat(self._file.fileno()).st_size != len(self._map)
+
+    def _decode(self, start: int, end: int) -> str:
+        """ Decode bytes start:end. Pages past the end of a truncated file are gone, reading them would be fatal. """
+        if self.changed:
+            raise OSError(f'{self.path} changed on disk since it was opened')
+        return self._map[start:end].decode(self.encoding, errors='replace')
+
+    def text(self, first_line: int = 1, last_line: int = None) -> str:
+        """ Text of lines first_line..last_line, both inclusive, without the newline after the last one """
+        last_line = len(self) if last_line is None else last_line
+        end = self.starts[last_line] - 1 if last_line < len(self) else len(self._map)
+        text = self._decode(self.starts[first_line - 1], end).replace('\r\n', '\n')
+        if last_line < len(self) and text.endswith('\r'):
+            return text[:-1]  # The '\r' of the last line's '\r\n'
+        return text
+
+    def lines(self, first_line: int = 1, last_line: int = None) -> list[str]:
+        """ Lines first_line..last_line, both inclusive """
+        return self.text(first_line, last_line).split('\n')
+
+    def close(self) -> None:
+        """ Unmap and close the file """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
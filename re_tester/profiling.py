@@ -0,0 +1,133 @@
+""" Optional per-evaluation instrumentation """
+import functools
+import heapq
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+# Phases timed on every profiled evaluation
+PHASES = ('compile', 'match', 'tag', 'tree', 'gutter')
+# Per-line match time histogram buckets, powers of two in microseconds: <1us, 1-2us, 2-4us ... >=2^(N-1)us
+HISTOGRAM_BUCKETS = 24
+
+
+@dataclass
+class LineProfile:
+    """ Per-line match times, collected by the worker """
+    top_n: int = 10
+    histogram: list[int] = field(default_factory=lambda: [0] * HISTOGRAM_BUCKETS)
+    slowest: list[tuple[float, int]] = field(default_factory=list)  # Min-heap of (seconds, line_number)
+
+    def add(self, line_number: int, seconds: float) -> None:
+        """ Record the match time of a line """
+        bucket = min(int(seconds * 1_000_000).bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.histogram[bucket] += 1
+        if len(self.slowest) < self.top_n:
+            heapq.heappush(self.slowest, (seconds, line_number))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, line_number))
+
+
+@dataclass
+class EvaluationProfile:
+    """ Timings of an evaluation, from compiling the pattern to drawing the results """
+    timings: dict[str, float] = field(default_factory=lambda: dict.fromkeys(PHASES, 0.0))  # Seconds
+    lines: Optional[LineProfile] = None
+
+    def add_timing(self, phase: str, seconds: float) -> None:
+        """ Accumulate time spent on a phase """
+        self.timings[phase] += seconds
+
+    def to_json(self) -> dict:
+        """ Return ready for JSON """
+        response = {'timings_ms': {phase: seconds * 1000 for phase, seconds in self.timings.items()}}
+        if self.lines is not None:
+            response['line_histogram'] = {_bucket_label(bucket): count
+                                          for bucket, count in enumerate(self.lines.histogram) if count}
+            response['slowest_lines'] = [{'line': line_number, 'ms': seconds * 1000}
+                                         for seconds, line_number in sorted(self.lines.slowest, reverse=True)]
+        return response
+
+    def summary(self) -> str:
+        """ Human readable report """
+        report = ['  '.join(f'{phase}: {seconds * 1000:.1f}ms' for phase, seconds in self.timings.items())]
+        if self.lines is not None:
+            report.append('Per-line match time: ' + '  '.join(
+                f'{_bucket_label(bucket)}: {count}' for bucket, count in enumerate(self.lines.histogram) if count))
+            report.append('Slowest lines: ' + '  '.join(
+                f'{line_number} ({seconds * 1000:.2f}ms)' for seconds, line_number in
+                sorted(self.lines.slowest, reverse=True)))
+        return '\n'.join(report)
+
+
+def _bucket_label(bucket: int) -> str:
+    """ Histogram bucket label """
+    if bucket == 0:
+        return '<1us'
+    if bucket == HISTOGRAM_BUCKETS - 1:
+        return f'>={2 ** (bucket - 1)}us'
+    return f'{2 ** (bucket - 1)}-{2 ** bucket}us'
+
+
+# Fallback origin of process_uptime()
+_IMPORTED_AT = time.monotonic()
+
+
+def process_uptime() -> float:
+    """
+    Seconds since the process started, read from /proc. Where that's not available, seconds since this module was
+    imported, which misses the interpreter's own startup.
+    """
+    try:
+        with open('/proc/self/stat', 'rb') as r_file:
+            start_ticks = int(r_file.read().rsplit(b')', 1)[1].split()[19])  # Field 22, starttime
+        with open('/proc/uptime', 'rb') as r_file:
+            uptime = float(r_file.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.monotonic() - _IMPORTED_AT
+
+
+# Profile of the evaluation in progress, None when profiling is disabled
+ACTIVE_PROFILE: Optional[EvaluationProfile] = None
+
+
+def start_profile(enabled: bool) -> Optional[EvaluationProfile]:
+    """ Start profiling a new evaluation, or stop profiling if not enabled """
+    global ACTIVE_PROFILE  # pylint: disable=global-statement
+    ACTIVE_PROFILE = EvaluationProfile() if enabled else None
+    return ACTIVE_PROFILE
+
+
+def stop_profile(profile: Optional[EvaluationProfile]) -> None:
+    """ Stop collecting into profile, if it is still the active one """
+    global ACTIVE_PROFILE  # pylint: disable=global-statement
+    if ACTIVE_PROFILE is profile:
+        ACTIVE_PROFILE = None
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """ Time the enclosed block into the active profile, if any """
+    profile = ACTIVE_PROFILE
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_timing(phase, time.perf_counter() - start)
+
+
+def profiled(phase: str) -> Callable:
+    """ Decorator, times every call of the function into the active profile, if any """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(phase):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
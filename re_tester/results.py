@@ -0,0 +1,171 @@
+""" Evaluation results storage """
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate
+from operator import itemgetter
+from typing import Iterable, Optional
+
+from re_tester.engine import LineMatch
+
+
+def _splice(column: array, rows: array, runs: list) -> array:
+    """ Copy of column with rows[start:end] inserted before column[position], for each (position, start, end) run """
+    spliced, previous = array(column.typecode), 0
+    for position, start, end in runs:
+        spliced += column[previous:position]
+        spliced += rows[start:end]
+        previous = position
+    spliced += column[previous:]
+    return spliced
+
+
+class ResultStore:
+    """
+    Matches sorted by the line they start on. A line may hold several matches.
+    Columnar: line numbers, spans and groups live in arrays, group and rule names are interned, and no match text is
+    kept, renderers slice it from the source when displaying it. Spans are offsets from the start of the line.
+    """
+    def __init__(self):
+        self.lines = array('i')
+        self._starts = array('i')
+        self._ends = array('i')
+        self._rules = array('h')  # Interned rule name, -1 if none
+        self._group_counts = array('i')
+        # Groups of match n are at _group_first[n]:_group_first[n + 1] of the group columns, the running sum of
+        # _group_counts
+        self._group_first = array('i', [0])
+        self._group_indexes = array('i')
+        self._group_names = array('h')  # Interned group name, -1 for anonymous groups
+        self._group_starts = array('i')
+        self._group_ends = array('i')
+
+        self._names: list[str] = []
+        self._name_ids: dict[str, int] = {}
+        self.rule_counts: Counter[str] = Counter()  # Hits per rule, when evaluating a rule set
+        self.distinct_lines = 0  # Lines with at least one result
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def _intern(self, name: Optional[str]) -> int:
+        """ Id of a group or rule name, -1 for None """
+        if name is None:
+            return -1
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return name_id
+
+    def add(self, line_number: int, line_match: LineMatch) -> None:
+        """ Add a match of a line after the ones already stored for it, keeping the store sorted """
+        self.extend(((line_number, line_match),))
+
+    def extend(self, results: Iterable[tuple[int, LineMatch]]) -> None:
+        """
+        Add a batch of results, each after the ones already stored for its line. Appending is the common case; results
+        landing before the end are spliced in with one pass over each column per batch.
+        """
+        results = sorted(results, key=itemgetter(0))  # Stable, the results of a line keep their order
+        if not results:
+            return
+        if not self.lines or results[0][0] >= self.lines[-1]:
+            for line_number, line_match in results:
+                self._append(line_number, line_match)
+            return
+
+        batch = ResultStore()
+        batch._names, batch._name_ids = self._names, self._name_ids  # Share interned names
+        for line_number, line_match in results:
+            batch._append(line_number, line_match)
+        # (position in the store, first batch row, end batch row) of each run of rows landing at the same position
+        runs = []
+        for row, line_number in enumerate(batch.lines):
+            position = bisect_right(self.lines, line_number)
+            if runs and runs[-1][0] == position:
+                runs[-1][2] = row + 1
+            else:
+                runs.append([position, row, row + 1])
+            if (not row or batch.lines[row - 1] != line_number) and position and \
+                    self.lines[position - 1] == line_number:
+                batch.distinct_lines -= 1  # Counted as new by batch._append, but already in the store
+
+        group_runs = [(self._group_first[position], batch._group_first[start], batch._group_first[end])
+                      for position, start, end in runs]
+        for name in ('lines', '_starts', '_ends', '_rules', '_group_counts'):
+            setattr(self, name, _splice(getattr(self, name), getattr(batch, name), runs))
+        for name in ('_group_indexes', '_group_names', '_group_starts', '_group_ends'):
+            setattr(self, name, _splice(getattr(self, name), getattr(batch, name), group_runs))
+        self._group_first = array('i', accumulate(self._group_counts, initial=0))
+        self.rule_counts.update(batch.rule_counts)
+        self.distinct_lines += batch.distinct_lines
+
+    def _append(self, line_number: int, line_match: LineMatch) -> None:
+        """ Add a result at the end, its line being the last one stored or after it """
+        if not self.lines or self.lines[-1] != line_number:
+            self.distinct_lines += 1
+        groups = line_match.groups
+        self.lines.append(line_number)
+        self._starts.append(line_match.span[0])
+        self._ends.append(line_match.span[1])
+        self._rules.append(self._intern(line_match.rule))
+        self._group_counts.append(len(groups))
+        for group in groups:
+            self._group_indexes.append(group.index)
+            self._group_names.append(self._intern(group.name))
+            self._group_starts.append(group.span[0])
+            self._group_ends.append(group.span[1])
+        self._group_first.append(self._group_first[-1] + len(groups))
+        if line_match.rule is not None:
+            self.rule_counts[line_match.rule] += 1
+
+    def position(self, line_number: int) -> int:
+        """ Position of the first result at or after line_number """
+        return bisect_left(self.lines, line_number)
+
+    def positions(self, line_number: int) -> range:
+        """ Positions of the results of line_number """
+        return range(bisect_left(self.lines, line_number), bisect_right(self.lines, line_number))
+
+    def span(self, position: int) -> tuple[int, int]:
+        """ Full match span of a result """
+        return self._starts[position], self._ends[position]
+
+    def rule(self, position: int) -> Optional[str]:
+        """ Rule that produced a result, if any """
+        rule_id = self._rules[position]
+        return None if rule_id == -1 else self._names[rule_id]
+
+    def group_count(self, position: int) -> int:
+        """ Number of participating groups of a result """
+        return self._group_counts[position]
+
+    def groups(self, position: int) -> list[tuple[int, Optional[str], int, int]]:
+        """ Participating groups of a result, as (index, name, start, end) """
+        return [(self._group_indexes[g], None if self._group_names[g] == -1 else self._names[self._group_names[g]],
+                 self._group_starts[g], self._group_ends[g])
+                for g in range(self._group_first[position], self._group_first[position + 1])]
+
+    def remove_lines(self, first_line: int, last_line: int, line_delta: int) -> None:
+        """
+        Remove the results of lines first_line..last_line, and renumber the ones after them
+        :param line_delta: int, how many lines were added (or removed if negative) in that range
+        """
+        start, end = bisect_left(self.lines, first_line), bisect_right(self.lines, last_line)
+        if start != end:
+            self.rule_counts.subtract(self.rule(position) for position in range(start, end)
+                                      if self._rules[position] != -1)
+            self.distinct_lines -= len(set(self.lines[start:end]))
+            group_start, group_end = self._group_first[start], self._group_first[end]
+            for column in (self.lines, self._starts, self._ends, self._rules, self._group_counts):
+                del column[start:end]
+            for column in (self._group_indexes, self._group_names, self._group_starts, self._group_ends):
+                del column[group_start:group_end]
+            self._group_first = array('i', accumulate(self._group_counts, initial=0))
+        if line_delta:
+            self.lines[start:] = array('i', (line_number + line_delta for line_number in self.lines[start:]))
+
+    def clear(self) -> None:
+        """ Remove every result """
+        self.__init__()
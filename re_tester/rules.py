@@ -0,0 +1,160 @@
+""" Rule sets: many named patterns evaluated together, as in a log classifier """
+import functools
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse  # pylint: disable=deprecated-module
+
+from re_tester.engine import MatchEngine, LineMatch, MODE_FIRST, MODE_ALL
+
+# Prefix of the groups wrapping each rule in the combined pattern
+_RULE_GROUP_PREFIX = '_rule'
+_BACKREFERENCES = (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """ A named pattern """
+    name: str
+    pattern: str
+
+
+def load_rules(path: str) -> list[Rule]:
+    """
+    Load a rule set, either a JSON file holding a {name: pattern} object or a list of {"name", "pattern"} objects,
+    or a text file with one pattern per line, named after their line number.
+    """
+    with open(path, 'r', encoding='utf-8') as r_file:
+        contents = r_file.read()
+    if path.lower().endswith('.json'):
+        data = json.loads(contents)
+        if isinstance(data, dict):
+            return [Rule(str(name), pattern) for name, pattern in data.items()]
+        return [Rule(str(item['name']), item['pattern']) for item in data]
+    return [Rule(f'line {line_n}', line) for line_n, line in enumerate(contents.splitlines(), start=1) if line]
+
+
+def _walk(subpattern: sre_parse.SubPattern) -> Iterator[int]:
+    """ Yield the opcode of every node of a parsed pattern """
+    for op, av in subpattern:
+        yield op
+        for value in av if isinstance(av, (tuple, list)) else (av,):
+            if isinstance(value, sre_parse.SubPattern):
+                yield from _walk(value)
+            elif isinstance(value, list):  # BRANCH alternatives
+                for alternative in value:
+                    if isinstance(alternative, sre_parse.SubPattern):
+                        yield from _walk(alternative)
+
+
+def can_merge(pattern: str, flags: int) -> bool:
+    """
+    Whether a pattern keeps its meaning when embedded in an alternation: it can't set global inline flags, which
+    would apply to every rule, nor use backreferences, whose group numbers would shift.
+    """
+    parsed = sre_parse.parse(pattern, flags)
+    if (parsed.state.flags & ~re.UNICODE) != (flags & ~re.UNICODE):
+        return False
+    return not any(op in _BACKREFERENCES for op in _walk(parsed))
+
+
+class RuleSetEngine:
+    """
+    MatchEngine counterpart for rule sets. Each line is attributed to the rule whose match starts first, ties going to
+    the earlier rule, which is what a single search over the alternation of every rule yields.
+    Compatible rules are combined into one alternation so each line is scanned once; the rest are searched one by one.
+    """
+    def __init__(self, rules: list[Rule], flags: int = 0, mode: str = MODE_FIRST):
+        """ :param mode: str, MODE_FIRST or MODE_ALL, rule sets match line by line """
+        if mode not in (MODE_FIRST, MODE_ALL):
+            raise ValueError('Rule sets match line by line, pick another mode')
+        self.mode = mode
+        self.rules = rules
+        self.engines = [self._compile(rule, flags) for rule in rules]
+
+        merged, self.fallback = [], []
+        used_names = set()
+        for rule_index, engine in enumerate(self.engines):
+            names = set(engine.pattern.groupindex)
+            if can_merge(engine.pattern.pattern, flags) and not names & used_names and \
+                    not any(name.startswith(_RULE_GROUP_PREFIX) for name in names):
+                merged.append(rule_index)
+                used_names |= names
+            else:
+                self.fallback.append(rule_index)
+
+        self.combined = None
+        self._wrapper_rules: dict[int, int] = {}  # Wrapper group index in the combined pattern -> rule index
+        if merged:
+            # Under re.VERBOSE a trailing comment would swallow the closing parenthesis, close it on the next line
+            end = '\n)' if flags & re.VERBOSE else ')'
+            self.combined = re.compile('|'.join(f'(?P<{_RULE_GROUP_PREFIX}{rule_index}>{rules[rule_index].pattern}{end}'
+                                                for rule_index in merged), flags)
+            self._wrapper_rules = {self.combined.groupindex[f'{_RULE_GROUP_PREFIX}{rule_index}']: rule_index
+                                   for rule_index in merged}
+
+    @staticmethod
+    def _compile(rule: Rule, flags: int) -> MatchEngine:
+        """ Compile a rule alone, naming it on errors """
+        try:
+            return MatchEngine(rule.pattern, MODE_FIRST, flags)
+        except re.error as e:
+            raise re.error(f'rule {rule.name}: {e.msg}', e.pattern, e.pos) from e
+
+    @property
+    def key(self) -> tuple:
+        """ Identifies the results this engine produces, for caching """
+        return tuple(engine.pattern for engine in self.engines), tuple(rule.name for rule in self.rules), self.mode
+
+    def _search(self, line: str, position: int) -> Optional[tuple[int, int, int, re.Match]]:
+        """
+        Earliest rule match starting at or after position, ties going to the earlier rule
+        :return: tuple[int, int, int, re.Match] (start, rule index, group offset, match), or None
+        """
+        best = None
+        if self.combined is not None:
+            match = self.combined.search(line, position)
+            if match is not None:
+                # The wrapper group closes last, and the rule's own groups follow it
+                best = (match.start(), self._wrapper_rules[match.lastindex], match.lastindex, match)
+        for rule_index in self.fallback:
+            match = self.engines[rule_index].pattern.search(line, position)
+            if match is not None and (best is None or (match.start(), rule_index) < best[:2]):
+                best = (match.start(), rule_index, 0, match)
+        return best
+
+    def match_line(self, line: str) -> tuple[LineMatch, ...]:
+        """
+        Match a single line, return an empty tuple if no rule matches. In MODE_ALL the line is scanned on from the end
+        of each match, as finditer does over the alternation of every rule.
+        """
+        line_matches, position = [], 0
+        while position <= len(line):
+            best = self._search(line, position)
+            if best is None:
+                break
+            _, rule_index, group_offset, match = best
+            line_matches.append(self.engines[rule_index].to_line_match(match, group_offset=group_offset,
+                                                                       rule=self.rules[rule_index].name))
+            if self.mode == MODE_FIRST:
+                break
+            position = match.end() if match.end() > match.start() else match.end() + 1
+        return tuple(line_matches)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_rule_set(path: str, version: tuple[int, int], flags: int, mode: str) -> RuleSetEngine:
+    """ load_rule_set, for a given version of the file """
+    return RuleSetEngine(load_rules(path), flags, mode)
+
+
+def load_rule_set(path: str, flags: int = 0, mode: str = MODE_FIRST) -> RuleSetEngine:
+    """ Load and compile a rule set, only reading the file again once it changed (its mtime or size) """
+    stat = os.stat(path)
+    return _load_rule_set(path, (stat.st_mtime_ns, stat.st_size), flags, mode)
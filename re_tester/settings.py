@@ -1,17 +1,28 @@
 """ Global Settings """
+import functools
 import json
 import os.path
-import sys
 import dataclasses
 from tkinter.font import Font
 
+# resources/ next to the package, wherever the process was started from
+RESOURCES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resources')
+
 
 @dataclasses.dataclass
 class Settings:
-    """ Color scheme and topmost behavior """
+    """ Color scheme, topmost behavior and evaluation tuning """
     topmost: bool = True
     font_family_name: str = 'Monospace'
     font_size: int = 10
+    evaluation_delay_ms: int = 150
+    evaluation_batch_size: int = 500
+    evaluation_timeout_s: float = 5.0
+    result_cache_size: int = 100000
+    profiling_enabled: bool = False
+    risk_confirm_lines: int = 10000
+    follow_interval_ms: int = 250
+    follow_max_lines: int = 10000
     default_background: str = "#29251c"
     default_foreground: str = "#e8c25d"
 
@@ -54,17 +65,16 @@ class Settings:
 
     def to_json(self):
         """ Return ready for JSON """
-        response = self.__dict__
+        response = dict(self.__dict__)
         response.pop('font')  # Take out font
         return response
 
     @staticmethod
-    def read_from_file():
+    def read_from_file(path: str = RESOURCES_PATH):
         """
         Attempt to load Settings from settings.json, create the file and folder if they do not exist, use default
         Settings values if the JSON is broken
         """
-        path = sys.path[0] + '/resources'
         s = Settings()
         if os.path.exists(path):
             try:
@@ -81,4 +91,19 @@ class Settings:
         return s
 
 
-SETTINGS: Settings = Settings.read_from_file()
+@functools.lru_cache(maxsize=None)
+def load_settings() -> Settings:
+    """ Settings, read from settings.json on first use only """
+    return Settings.read_from_file()
+
+
+class _LazySettings:
+    """ Stands for the Settings, loading them on first attribute access so importing has no side effects """
+    def __getattr__(self, name):
+        return getattr(load_settings(), name)
+
+    def __setattr__(self, name, value):
+        setattr(load_settings(), name, value)
+
+
+SETTINGS: Settings = _LazySettings()
@@ -0,0 +1,75 @@
+""" Following a growing file, as tail -F does """
+import codecs
+import os
+from typing import Optional
+
+
+class FileFollower:
+    """
+    Reads what was appended to a file since the last poll. Starts over from the beginning when the file is truncated,
+    or when it is replaced by a new one (log rotation), after reading what was left of the old one.
+    Reads are bounded, so a burst of writes is spread over several polls.
+    """
+    def __init__(self, path: str, encoding: str = 'utf-8', max_read: int = 1 << 20):
+        """
+        :param path: str, file to follow
+        :param encoding: str, encoding of the file, undecodable bytes are replaced
+        :param max_read: int, bytes read at most per poll, also how far back from the end following starts
+        """
+        self.path = path
+        self.encoding = encoding
+        self.max_read = max_read
+        self.offset = 0
+        self._file = None
+        self._identity: Optional[tuple[int, int]] = None  # (device, inode) of the file being read
+        self._decoder = None
+        self._partial = ''  # Text after the last newline, completed by a later read
+        self._skip_first = False  # Started mid-file, the first line read is likely cut
+        self._open(from_end=True)
+
+    def _open(self, from_end: bool) -> None:
+        """ (Re)open the file, at its beginning or close to its end """
+        self.close()
+        self._file = open(self.path, 'rb')  # pylint: disable=consider-using-with
+        stat = os.fstat(self._file.fileno())
+        self._identity = (stat.st_dev, stat.st_ino)
+        self.offset = max(stat.st_size - self.max_read, 0) if from_end else 0
+        self._file.seek(self.offset)
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        self._partial = ''
+        self._skip_first = self.offset > 0
+
+    def poll(self) -> list[str]:
+        """ Return the complete lines appended since the last poll. A trailing partial line waits for its newline. """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []  # Rotating, the new file is not there yet
+        lines = []
+        if (stat.st_dev, stat.st_ino) != self._identity:  # Rotated, drain the old file then switch
+            lines = self._read(-1)
+            if self._partial:
+                lines.append(self._partial)
+            self._open(from_end=False)
+        elif stat.st_size < self.offset:  # Truncated
+            self._file.seek(0)
+            self.offset = 0
+            self._decoder.reset()
+            self._partial = ''
+        return lines + self._read(self.max_read)
+
+    def _read(self, size: int) -> list[str]:
+        """ Read up to size bytes, -1 for everything, and return the lines completed """
+        data = self._file.read(size)
+        self.offset += len(data)
+        *lines, self._partial = (self._partial + self._decoder.decode(data)).split('\n')
+        if self._skip_first and lines:
+            del lines[0]
+            self._skip_first = False
+        return [line[:-1] if line.endswith('\r') else line for line in lines]
+
+    def close(self) -> None:
+        """ Close the file """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,6 +1,9 @@
 """ Custom widgets definition """
+from contextlib import contextmanager
+from typing import Iterator
 from tkinter import Text, Canvas, Widget
 from re_tester.settings import SETTINGS
+from re_tester.profiling import profiled
 
 
 class CustomText(Text):
@@ -13,20 +16,59 @@ class CustomText(Text):
         self._orig = self._w + "_orig"
         self.tk.call("rename", self._w, self._orig)
         self.tk.createcommand(self._w, self._proxy)
+        # Lines touched since the last pop_dirty(), as (first_line, last_line, line_delta) in current numbering
+        self._dirty = None
+        self._quiet = False
 
     def _proxy(self, command, *args):
         cmd = (self._orig, command) + args
-        result = self.tk.call(cmd)
-
-        if command in ("insert", "delete", "replace"):
+        # A disabled widget ignores edits, key bindings still send them
+        if command in ("insert", "delete", "replace") and not self._quiet and \
+                str(self.tk.call(self._orig, "cget", "-state")) != "disabled":
+            first_line = self.index_to_line_n(str(self.tk.call(self._orig, "index", args[0])))
+            total_before = self.get_total_line_n()
+            result = self.tk.call(cmd)
+            if command == "delete":
+                inserted = ''
+            elif command == "insert":
+                inserted = ''.join(args[1::2])  # insert index chars ?tagList chars tagList ...?
+            else:
+                inserted = ''.join(args[2::2])  # replace index1 index2 chars ?tagList chars tagList ...?
+            self._mark_dirty(first_line, first_line + inserted.count('\n'), self.get_total_line_n() - total_before)
             self.event_generate("<<TextModified>>")
+        else:
+            result = self.tk.call(cmd)
 
         return result
 
-    def remove_all_tags(self):
-        """ Delete all tags """
-        for tag in self.tag_names():
-            self.tag_delete(tag)  # Easy way, but requires recreating them each time
+    def _mark_dirty(self, first_line: int, last_line: int, line_delta: int) -> None:
+        """ Merge an edit into the pending dirty range """
+        first_line = min(first_line, self.get_total_line_n())  # Inserting at 'end' lands on the last line
+        last_line = max(min(last_line, self.get_total_line_n()), first_line)
+        if self._dirty is not None:
+            d_first, d_last, d_delta = self._dirty
+            if first_line <= d_last:
+                d_last += line_delta  # Lines of the previous range after the edit were shifted
+            first_line, last_line = min(first_line, d_first), max(last_line, d_last, first_line)
+            line_delta += d_delta
+        self._dirty = (first_line, last_line, line_delta)
+
+    @contextmanager
+    def quiet(self) -> Iterator[None]:
+        """ Edits made in the block are neither tracked nor reported, the caller takes care of evaluating them """
+        self._quiet = True
+        try:
+            yield
+        finally:
+            self._quiet = False
+
+    def pop_dirty(self):
+        """
+        Return the lines touched since the last call and reset tracking.
+        :return: tuple[int, int, int] (first_line, last_line, line_delta) in current numbering, or None if untouched
+        """
+        dirty, self._dirty = self._dirty, None
+        return dirty
 
     def get_total_line_n(self) -> int:
         """ Return the number of lines in the widget """
@@ -36,6 +78,10 @@ class CustomText(Text):
         """ Return the contents of the Widget separated by line """
         return self.get('0.0', 'end').split('\n')[:-1]
 
+    def get_lines(self, first_line: int, last_line: int) -> list:
+        """ Return the contents of lines first_line..last_line, both inclusive """
+        return self.get(f'{first_line}.0', f'{last_line}.end').split('\n')
+
     def get_all_dlines(self) -> list:
         """
         Return a list with every line number and their associated dlineinfo
@@ -43,12 +89,15 @@ class CustomText(Text):
         """
         results = []
 
-        line_index = self.index('@0,0')
+        line_index = self.index('@0,0')  # The top line may be wrapped and partially scrolled off
+        line_n, total_line_n = self.index_to_line_n(line_index), self.get_total_line_n()
         d_line = self.dlineinfo(line_index)
         while d_line:
-            results.append((d_line, self.index_to_line_n(line_index)))
-            line_index = self.index(f'{line_index}+1line')
-            d_line = self.dlineinfo(line_index)
+            results.append((d_line, line_n))
+            line_n += 1
+            if line_n > total_line_n:
+                break
+            d_line = self.dlineinfo(f'{line_n}.0')
 
         return results
 
@@ -63,48 +112,81 @@ class CustomText(Text):
 class LeftLineNumbersBar(Canvas):
     """
     Width-responsive line numbering.
+    Keeps a pool of canvas text items that get moved and relabeled, instead of recreating them on every draw.
     Modification on: https://stackoverflow.com/a/16375233
     """
+    # Width of a digit, per font name
+    _digit_widths: dict[str, int] = {}
+
     def __init__(self, master: Widget):
         super().__init__(master)
         self.config(width=0, borderwidth=0, highlightthickness=0,
                     bg=SETTINGS.test_box_frame_line_numbers_background_color)
         self._x_padding = 5
+        self._items: list[int] = []
+        self._item_states: list[tuple[int, str]] = []  # (y_position, text) shown by each item, or None if hidden
+        self._drawn_view = None
 
-    def _clear(self) -> None:
-        """ Clear contents """
-        self.delete('all')
-
+    @profiled('gutter')
     def draw_line_numbers(self, textbox: CustomText) -> None:
         """
-        Write TextBox line numbers
+        Write TextBox line numbers, skipped when the view has not changed since the last draw
         :param textbox: TextBox object
         """
-        self._clear()
         total_line_n = textbox.get_total_line_n()
-        self.config(width=self._get_width(total_line_n, self._x_padding))
-
-        for d_line, line_number in textbox.get_all_dlines():
-            y_position = d_line[1]
-            line_number_str = self._fmt_line_n(line_number, total_line_n)
-            self._write_text(self._x_padding, y_position, line_number_str)
-
-    def _write_text(self, x_position: int, y_position: int, text: str):
+        top, bottom = textbox.index('@0,0'), textbox.index(f'@0,{textbox.winfo_height()}')
+        # The y of the top and bottom lines catch lines in between wrapping or unwrapping, which moves the ones below
+        view = (top, bottom, textbox.dlineinfo(top), textbox.dlineinfo(bottom), total_line_n, len(str(total_line_n)))
+        if view == self._drawn_view:
+            return
+        self._drawn_view = view
+
+        width = self._get_width(total_line_n, self._x_padding)
+        if width != int(self.cget('width')):
+            self.config(width=width)
+
+        d_lines = textbox.get_all_dlines()
+        while len(self._items) < len(d_lines):
+            self._items.append(self._write_text(self._x_padding, 0, ''))
+            self._item_states.append(None)
+
+        for item_n, (d_line, line_number) in enumerate(d_lines):
+            item, previous = self._items[item_n], self._item_states[item_n]
+            state = (d_line[1], self._fmt_line_n(line_number, total_line_n))
+            if state == previous:
+                continue
+            if previous is None:
+                self.itemconfigure(item, state='normal')
+            if previous is None or previous[0] != state[0]:
+                self.coords(item, self._x_padding, state[0])
+            if previous is None or previous[1] != state[1]:
+                self.itemconfigure(item, text=state[1])
+            self._item_states[item_n] = state
+
+        for item_n in range(len(d_lines), len(self._items)):
+            if self._item_states[item_n] is not None:
+                self.itemconfigure(self._items[item_n], state='hidden')
+                self._item_states[item_n] = None
+
+    def _write_text(self, x_position: int, y_position: int, text: str) -> int:
         """
         Create text on canvas
         """
-        self.create_text(x_position, y_position, anchor='nw', text=text,
-                         fill=SETTINGS.test_box_frame_line_numbers_foreground_color, font=SETTINGS.font)
+        return self.create_text(x_position, y_position, anchor='nw', text=text,
+                                fill=SETTINGS.test_box_frame_line_numbers_foreground_color, font=SETTINGS.font)
 
-    @staticmethod
-    def _get_width(total_lines: int, x_padding: int) -> int:
+    @classmethod
+    def _get_width(cls, total_lines: int, x_padding: int) -> int:
         """
         Get the width the Canvas should have to fit the width of the largest line number with
         the specified font.
         :param total_lines: int, the total lines we are working with
         :param x_padding: int, the padding for the text, we add this * 2 to account for it
         """
-        return SETTINGS.font.measure('0' * len(str(total_lines))) + (x_padding * 2)
+        font_name = str(SETTINGS.font)
+        if font_name not in cls._digit_widths:
+            cls._digit_widths[font_name] = SETTINGS.font.measure('0')
+        return cls._digit_widths[font_name] * len(str(total_lines)) + (x_padding * 2)
 
     @staticmethod
     def _fmt_line_n(line_number: int, total_lines: int, offset: int = 0) -> str:
@@ -0,0 +1,174 @@
+""" Out-of-process evaluation, so a runaway pattern can be killed without taking the UI with it """
+import multiprocessing
+import queue
+import time
+from typing import Any, Optional, Sequence, Union
+
+from re_tester.engine import MatchEngine, LineMatch, MODE_BUFFER
+from re_tester.profiling import LineProfile
+
+# A line running longer than this when a new job is submitted is considered stuck, the worker gets killed instead of
+# waiting for it to notice the cancellation.
+_STUCK_LINE_S = 0.25
+# Maximum messages drained per poll, so a flood of results can't block the UI for long
+_MAX_MESSAGES_PER_POLL = 50
+
+
+def _worker_loop(jobs: Any, results: Any, wanted_generation: Any, current_line: Any, line_started: Any,
+                 batch_size: int) -> None:
+    """
+    Worker process main loop, evaluates jobs and streams results back in batches.
+    Messages are (kind, generation, payload) tuples, kind being 'batch' or 'done'. The payload of 'done' is the
+    (match seconds, LineProfile) of the job when profiled, None otherwise.
+    In MODE_BUFFER jobs, lines is the whole text and current_line is the line of the last match found.
+    """
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        generation, engine, line_numbers, lines, profile = job
+        batch = []
+        line_profile = LineProfile() if profile and engine.mode != MODE_BUFFER else None
+        job_started = time.perf_counter()
+
+        def publish(pair: tuple[int, LineMatch]) -> None:
+            batch.append(pair)
+            if len(batch) >= batch_size:
+                results.put(('batch', generation, batch[:]))
+                batch.clear()
+
+        if engine.mode == MODE_BUFFER:
+            line_started.value = time.monotonic()
+            for line_number, line_match in engine.evaluate_buffer(lines):
+                if wanted_generation.value != generation:
+                    break  # Superseded
+                current_line.value = line_number
+                publish((line_number, line_match))
+            else:
+                results.put(('batch', generation, batch))
+                results.put(('done', generation, (time.perf_counter() - job_started, None) if profile else None))
+        else:
+            match_line = engine.match_line
+            for line_number, line in zip(line_numbers, lines):
+                if wanted_generation.value != generation:
+                    break  # Superseded
+                current_line.value = line_number
+                line_started.value = time.monotonic()
+                if line_profile is None:
+                    line_matches = match_line(line)
+                else:
+                    line_start = time.perf_counter()
+                    line_matches = match_line(line)
+                    line_profile.add(line_number, time.perf_counter() - line_start)
+                for line_match in line_matches:
+                    publish((line_number, line_match))
+            else:
+                results.put(('batch', generation, batch))
+                results.put(('done', generation,
+                             (time.perf_counter() - job_started, line_profile) if profile else None))
+
+
+class EvaluationWorker:
+    """ Handle to the evaluation process, used from the Tk main thread """
+    def __init__(self, batch_size: int):
+        self._batch_size = batch_size
+        self._context = multiprocessing.get_context('spawn')
+        self._process = None
+        self._jobs = None
+        self._results = None
+        self._wanted_generation = self._context.RawValue('q', -1)
+        self._current_line = self._context.RawValue('q', 0)
+        self._line_started = self._context.RawValue('d', 0.0)
+
+        self.generation: Optional[int] = None  # Generation of the job in flight, None if idle
+        self.started = 0.0
+        self._buffer_mode = False
+
+    @property
+    def busy(self) -> bool:
+        """ Whether a job is in flight """
+        return self.generation is not None
+
+    def _spawn(self) -> None:
+        """ Start a fresh worker process """
+        self._jobs = self._context.Queue()
+        self._results = self._context.Queue()
+        self._process = self._context.Process(target=_worker_loop, daemon=True,
+                                              args=(self._jobs, self._results, self._wanted_generation,
+                                                    self._current_line, self._line_started, self._batch_size))
+        self._process.start()
+
+    def submit(self, generation: int, engine: MatchEngine, line_numbers: Sequence[int],
+               lines: Union[list[str], str], profile: bool = False) -> None:
+        """
+        Submit a job, superseding the one in flight.
+        :param generation: int, identifies the job on the messages it produces
+        :param engine: MatchEngine or RuleSetEngine, pickled over to the worker
+        :param line_numbers: Sequence[int], number of each line, a range pickles compactly for contiguous lines
+        :param lines: list[str], lines to match, or the whole text for MODE_BUFFER engines
+        :param profile: bool, whether to time the job and each of its lines
+        """
+        if self.busy and time.monotonic() - self._line_started.value > _STUCK_LINE_S:
+            self.kill()
+        if self._process is None or not self._process.is_alive():
+            self._spawn()
+        self._wanted_generation.value = generation
+        self._line_started.value = time.monotonic()
+        self.generation = generation
+        self.started = time.monotonic()
+        self._buffer_mode = engine.mode == MODE_BUFFER
+        self._jobs.put((generation, engine, line_numbers, lines, profile))
+
+    def poll(self) -> list[tuple[str, int, Any]]:
+        """ Return pending messages without blocking """
+        messages = []
+        if self._results is None:
+            return messages
+        for _ in range(_MAX_MESSAGES_PER_POLL):
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                break
+            kind, generation, _ = message
+            if kind == 'done' and generation == self.generation:
+                self.generation = None
+            messages.append(message)
+        return messages
+
+    def check_timeout(self, timeout: float) -> Optional[str]:
+        """
+        Kill the worker if the job in flight exceeded the timeout.
+        :return: str describing where it got stuck if it was killed, None otherwise
+        """
+        if not self.busy:
+            return None
+        now = time.monotonic()
+        elapsed = now - self.started
+        if elapsed <= timeout:
+            return None
+        line_number, line_elapsed = self._current_line.value, now - self._line_started.value
+        self.kill()
+        if self._buffer_mode:
+            return f'Evaluation timed out after {elapsed:.2f}s, last match found on line {line_number}'
+        return f'Evaluation timed out after {elapsed:.2f}s, stuck on line {line_number} ' \
+               f'for {line_elapsed:.2f}s'
+
+    def kill(self) -> None:
+        """ Terminate the worker process, a new one is spawned on the next submit """
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+        # Jobs nobody reads anymore may be stuck in a feeder thread, which exit would otherwise wait for
+        for pipe in (self._jobs, self._results):
+            if pipe is not None:
+                pipe.cancel_join_thread()
+                pipe.close()
+        self._jobs = self._results = None
+        self.generation = None
+
+    def close(self) -> None:
+        """ Ask the worker process to exit """
+        if self._process is not None and self._process.is_alive():
+            self._jobs.put(None)
+        self._process = None
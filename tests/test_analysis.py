@@ -0,0 +1,29 @@
+""" Static pattern risk analysis """
+import pytest
+
+from re_tester.analysis import analyze
+
+
+def reasons(pattern: str) -> list:
+    """ (expression, reason) of every risk found """
+    return [(risk.expression, risk.reason) for risk in analyze(pattern)]
+
+
+@pytest.mark.parametrize('pattern', [r'(a|aa)+$', r'(?:x|y?)+', r'(a|a?b)+c'])
+def test_overlapping_alternatives_under_repetition(pattern):
+    assert any(reason.startswith('alternatives') for _, reason in reasons(pattern))
+
+
+def test_factored_prefix_is_shown_grouped():
+    assert reasons(r'(a|aa)+$') == [('(a(?:|a))+', 'alternatives that can match the same text under repetition')]
+
+
+@pytest.mark.parametrize('pattern', [r'(a|b)+', r'(a|ab)+', r'(foo|bar)*', r'(a|aa){2}', r'\d+-\w+'])
+def test_safe_patterns(pattern):
+    assert reasons(pattern) == []
+
+
+def test_nested_and_adjacent_quantifiers():
+    assert [reason.split(',')[0] for _, reason in reasons(r'^(\w+\s?)+$')] == ['nested quantifiers']
+    assert [reason.split(',')[0] for _, reason in reasons(r'\d+\w+')] == \
+        ['adjacent quantifiers that can match the same characters']
@@ -0,0 +1,51 @@
+""" Command-line batch mode """
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from re_tester.cli import main
+
+
+def test_missing_file_is_reported_and_the_others_matched(tmp_path, capsys):
+    path = tmp_path / 'in.txt'
+    path.write_text('a1\nb\nc22\n', encoding='utf-8')
+    assert main([r'\d+', str(tmp_path / 'missing.txt'), str(path)]) == 2
+    out, err = capsys.readouterr()
+    assert 'missing.txt: No such file or directory' in err
+    assert [json.loads(record)['line'] for record in out.splitlines()] == [1, 3]
+
+
+@pytest.mark.parametrize('option', ['--jobs', '--chunk-lines'])
+def test_counts_must_be_positive(option, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['a', option, '0'])
+    assert exit_info.value.code == 2
+    assert 'must be at least 1' in capsys.readouterr().err
+
+
+def test_closed_pipe_ends_quietly(tmp_path):
+    path = tmp_path / 'in.txt'
+    path.write_text('\n'.join(map(str, range(200_000))), encoding='utf-8')
+    with subprocess.Popen([sys.executable, '-m', 're_tester', r'\d+', str(path), '--jobs', '1'],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=Path(__file__).parents[1]) as process:
+        process.stdout.readline()
+        process.stdout.close()
+        assert process.wait(timeout=60) == 1
+        assert process.stderr.read() == b''
+
+
+def test_only_newlines_end_lines(tmp_path, capsys):
+    path = tmp_path / 'in.txt'
+    path.write_bytes(b'a\rb\nc\r\nc')
+    assert main(['^c$', str(path)]) == 0
+    assert [json.loads(record)['line'] for record in capsys.readouterr().out.splitlines()] == [2, 3]
+
+
+def test_overflowing_pattern_is_reported(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['a{4294967296}'])
+    assert exit_info.value.code == 2
+    assert 'invalid pattern' in capsys.readouterr().err
@@ -0,0 +1,31 @@
+""" A/B comparison of two versions of a pattern """
+import pytest
+
+from re_tester.compare import CompareEngine, RULE_A, RULE_B
+from re_tester.engine import MatchEngine, MODE_ALL, MODE_BUFFER
+
+
+def compare(pattern_a: str, pattern_b: str, line: str, mode: str = MODE_ALL) -> list:
+    """ (rule, span) of every result of a line """
+    engine = CompareEngine(MatchEngine(pattern_a, mode), MatchEngine(pattern_b, mode))
+    return [(line_match.rule, line_match.span) for line_match in engine.match_line(line)]
+
+
+def test_agreeing_patterns_yield_nothing():
+    assert compare(r'\d+', r'[0-9]+', 'a 12 b 3') == []
+    assert compare(r'x', r'y', 'no match') == []
+
+
+def test_differing_matches_yield_both_sides():
+    assert compare(r'\d+', r'\d', 'a 12') == [(RULE_A, (2, 4)), (RULE_B, (2, 3)), (RULE_B, (3, 4))]
+    assert compare(r'\d+', r'x', 'a 12') == [(RULE_A, (2, 4))]
+
+
+def test_group_captures_count():
+    # Same match spans, different groups
+    assert compare(r'(a)b', r'a(b)', 'ab') == [(RULE_A, (0, 2)), (RULE_B, (0, 2))]
+
+
+def test_buffer_mode_is_refused():
+    with pytest.raises(ValueError):
+        CompareEngine(MatchEngine('a', MODE_BUFFER), MatchEngine('b', MODE_BUFFER))
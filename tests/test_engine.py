@@ -0,0 +1,78 @@
+""" Matching engine and its per-line cache """
+import re
+
+import pytest
+
+from re_tester.engine import MatchEngine, GroupMatch, ResultCache, CacheFiller, line_starts, MODE_ALL, MODE_BUFFER
+
+
+def test_cache_round_trip():
+    engine, cache = MatchEngine(r'(?P<key>\w+)=(\d+)?', MODE_ALL), ResultCache(2)
+    for line in ('a=1 b= c=3', 'nothing here', ''):
+        cache.put(engine.key, line, engine.match_line(line))
+        assert cache.get(engine.key, line) == engine.match_line(line)
+    assert len(cache) == 2
+    assert cache.get(engine.key, 'a=1 b= c=3') is None  # Evicted
+
+
+def test_cache_is_keyed_by_engine():
+    cache = ResultCache(10)
+    engine_a, engine_b = MatchEngine('a'), MatchEngine('a', flags=re.IGNORECASE)
+    cache.put(engine_a.key, 'xa', engine_a.match_line('xa'))
+    assert cache.get(engine_a.key, 'xa') == engine_a.match_line('xa')
+    assert cache.get(engine_b.key, 'xa') is None
+    assert cache.get(MatchEngine('a').key, 'xa') == engine_a.match_line('xa')  # Same pattern, compiled again
+
+
+def test_filler_caches_lines_as_batches_complete():
+    engine, cache = MatchEngine(r'\d', MODE_ALL), ResultCache(10)
+    lines = ['1 2 3', 'none', '4', 'none', '5 6']
+    line_numbers = [10, 11, 12, 14, 15]
+    filler = CacheFiller(cache, engine.key, line_numbers, lines)
+    results = [(line_number, line_match) for line_number, line in zip(line_numbers, lines)
+               for line_match in engine.match_line(line)]
+    filler.add(results[:2])  # Line 10 goes on in the next batch
+    assert len(cache) == 0
+    filler.add(results[2:5])
+    assert len(cache) == 3  # Lines 10 to 14, 'none' twice, line 15 may go on
+    assert cache.get(engine.key, '1 2 3') == engine.match_line('1 2 3')
+    assert cache.get(engine.key, 'none') == ()
+    filler.add(results[5:])
+    filler.done()
+    assert cache.get(engine.key, '5 6') == engine.match_line('5 6')
+    assert len(cache) == 4
+
+
+def test_filler_skips_lines_evicted_right_away():
+    engine, cache = MatchEngine(r'\d'), ResultCache(2)
+    lines = ['1', '2', '3']
+    filler = CacheFiller(cache, engine.key, range(1, 4), lines)
+    filler.add(engine.evaluate(lines))
+    filler.done()
+    assert [cache.get(engine.key, line) is not None for line in lines] == [False, True, True]
+
+
+@pytest.mark.parametrize('text, starts', [
+    ('', [0]),
+    ('a', [0]),
+    ('a\n', [0, 2]),
+    ('ab\n\ncd', [0, 3, 4]),
+])
+def test_line_starts(text, starts):
+    assert list(line_starts(text)) == starts
+    assert list(line_starts(text.encode())) == starts
+
+
+def test_line_starts_count_bytes():
+    assert list(line_starts('é\nb'.encode())) == [0, 3]
+
+
+def test_buffer_matches_are_relative_to_their_first_line():
+    text = 'ab\ncd\n\nef'
+    engine = MatchEngine(r'(b\nc)|(?P<e>e)f', MODE_BUFFER)
+    results = list(engine.evaluate_buffer(text))
+    assert results == list(engine.evaluate_buffer(text, line_starts(text)))
+    assert [(line_number, line_match.span, line_match.text) for line_number, line_match in results] == \
+        [(1, (1, 4), 'b\nc'), (4, (0, 2), 'ef')]
+    assert results[0][1].groups == (GroupMatch(1, None, (1, 4), 'b\nc'),)
+    assert results[1][1].groups == (GroupMatch(2, 'e', (0, 1), 'e'),)
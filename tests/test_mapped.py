@@ -0,0 +1,66 @@
+""" Memory-mapped input files """
+import pytest
+
+from re_tester.mapped import MappedFile
+
+
+def test_truncated_file_is_not_read(tmp_path):
+    path = tmp_path / 'in.log'
+    path.write_bytes(b'line\n' * 10_000)
+    mapped = MappedFile(str(path))
+    try:
+        assert not mapped.changed
+        with open(path, 'r+b') as w_file:  # As copytruncate does
+            w_file.truncate(0)
+        assert mapped.changed
+        with pytest.raises(OSError):
+            mapped.lines()
+    finally:
+        mapped.close()
+
+
+def test_crlf_line_endings_are_normalized(tmp_path):
+    path = tmp_path / 'in.txt'
+    path.write_bytes(b'a\r\nb\rc\r\nd\r')
+    mapped = MappedFile(str(path))
+    try:
+        assert mapped.lines() == ['a', 'b\rc', 'd\r']  # Only '\r\n' ends a line, a last line has no newline
+        assert mapped.lines(1, 1) == ['a']
+        assert mapped.text(2, 2) == 'b\rc'
+    finally:
+        mapped.close()
+
+
+@pytest.mark.parametrize('data, lines', [
+    (b'', ['']),
+    (b'one', ['one']),
+    (b'one\n', ['one', '']),  # A trailing newline makes for a last, empty line, as in the Text widget
+    (b'one\ntwo\n\nfour', ['one', 'two', '', 'four']),
+])
+def test_lines(tmp_path, data, lines):
+    path = tmp_path / 'in.txt'
+    path.write_bytes(data)
+    mapped = MappedFile(str(path))
+    try:
+        assert len(mapped) == len(lines)
+        assert mapped.lines() == lines
+        assert mapped.text() == '\n'.join(lines)
+        assert not mapped.changed
+    finally:
+        mapped.close()
+
+
+def test_line_ranges_and_undecodable_bytes(tmp_path):
+    path = tmp_path / 'in.txt'
+    path.write_bytes('é\nb\xff\nc\nd'.encode('latin-1'))
+    mapped = MappedFile(str(path), encoding='latin-1')
+    try:
+        assert mapped.lines(2, 3) == ['b\xff', 'c']
+        assert mapped.text(4) == 'd'
+    finally:
+        mapped.close()
+    mapped = MappedFile(str(path))
+    try:
+        assert mapped.lines(1, 2) == ['\ufffd', 'b\ufffd']
+    finally:
+        mapped.close()
@@ -0,0 +1,78 @@
+""" ResultStore against a plain list of results """
+import random
+import time
+from collections import Counter
+
+from re_tester.engine import GroupMatch, LineMatch
+from re_tester.results import ResultStore
+
+
+def make_match(rng: random.Random) -> LineMatch:
+    """ Random match with up to three groups, some of them named """
+    groups = tuple(GroupMatch(index, rng.choice((None, 'a', 'b')), (index, index + 1), '')
+                   for index in range(1, rng.randint(0, 3) + 1))
+    start = rng.randint(0, 50)
+    return LineMatch((start, start + rng.randint(0, 10)), '', groups, rng.choice((None, 'rule')))
+
+
+def contents(store: ResultStore) -> list:
+    """ Every result as (line, span, rule, groups) """
+    return [(store.lines[position], store.span(position), store.rule(position), store.groups(position))
+            for position in range(len(store))]
+
+
+def row(line_number: int, line_match: LineMatch) -> tuple:
+    """ What contents() shows for a result """
+    return (line_number, line_match.span, line_match.rule,
+            [(group.index, group.name, *group.span) for group in line_match.groups])
+
+
+def check(store: ResultStore, reference: list) -> None:
+    """ The store holds the reference results, and its counters agree """
+    assert contents(store) == reference
+    assert store.distinct_lines == len({line_number for line_number, *_ in reference})
+    assert +store.rule_counts == +Counter(rule for _, _, rule, _ in reference if rule)
+    assert all(store.group_count(position) == len(reference[position][3]) for position in range(len(store)))
+
+
+def test_extend_out_of_order():
+    rng = random.Random(1)
+    store, reference = ResultStore(), []
+    for _ in range(200):
+        batch = [(rng.randint(1, 100), make_match(rng)) for _ in range(rng.randint(0, 20))]
+        store.extend(batch)
+        for line_number, line_match in sorted(batch, key=lambda result: result[0]):
+            # After the results already stored for the line
+            position = sum(1 for stored in reference if stored[0] <= line_number)
+            reference.insert(position, row(line_number, line_match))
+        check(store, reference)
+
+
+def test_remove_lines():
+    rng = random.Random(2)
+    store, reference = ResultStore(), []
+    for _ in range(300):
+        if rng.random() < 0.6:
+            line_number, line_match = rng.randint(1, 100), make_match(rng)
+            store.add(line_number, line_match)
+            position = sum(1 for stored in reference if stored[0] <= line_number)
+            reference.insert(position, row(line_number, line_match))
+        else:
+            first_line = rng.randint(1, 100)
+            last_line = first_line + rng.randint(0, 5)
+            line_delta = rng.randint(-(last_line - first_line + 1), 5)
+            store.remove_lines(first_line, last_line, line_delta)
+            reference = [(line_number + line_delta if line_number > last_line else line_number, *rest)
+                         for line_number, *rest in reference if not first_line <= line_number <= last_line]
+        check(store, reference)
+
+
+def test_extend_in_the_middle_is_not_quadratic():
+    store = ResultStore()
+    store.extend((line_number, LineMatch((0, 1), '', (GroupMatch(1, None, (0, 1), ''),)))
+                 for line_number in range(1, 100_001))
+    start = time.perf_counter()
+    store.remove_lines(10, 10, 1000)
+    store.extend((line_number, LineMatch((0, 1), '', ())) for line_number in range(10, 1010))
+    assert time.perf_counter() - start < 1.0
+    assert len(store) == 101_000 - 1
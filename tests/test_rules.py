@@ -0,0 +1,46 @@
+""" Rule sets """
+import json
+import re
+
+from re_tester.engine import MODE_ALL
+from re_tester.rules import Rule, RuleSetEngine, load_rule_set
+
+
+def summary(engine: RuleSetEngine, line: str) -> list:
+    """ (rule, span) of every result of a line """
+    return [(line_match.rule, line_match.span) for line_match in engine.match_line(line)]
+
+
+def test_verbose_comments_do_not_swallow_the_wrapper():
+    engine = RuleSetEngine([Rule('a', 'foo  # c'), Rule('b', 'bar')], re.X)
+    assert engine.combined is not None and not engine.fallback
+    assert summary(engine, 'xx bar foo') == [('b', (3, 6))]
+
+
+def test_first_match_wins_across_merged_and_fallback_rules():
+    # Rule b has a backreference, so it is searched on its own
+    engine = RuleSetEngine([Rule('a', r'\d+'), Rule('b', r'(x)\1'), Rule('c', r'[a-z]+')])
+    assert engine.fallback == [1]
+    assert summary(engine, '-- xx 12') == [('b', (3, 5))]
+    assert summary(engine, '-- 12 xx') == [('a', (3, 5))]
+    assert summary(engine, '--') == []
+
+
+def test_all_mode_scans_the_whole_line():
+    rules = [Rule('a', r'\d+'), Rule('b', r'(x)\1'), Rule('c', r'[a-z]+')]
+    line = 'xxy 12 ab 3 xx'
+    expected = [(match.lastgroup, match.span()) for match in re.finditer(r'(?P<b>xx)|(?P<a>\d+)|(?P<c>[a-z]+)', line)]
+    assert summary(RuleSetEngine(rules, mode=MODE_ALL), line) == expected
+
+
+def test_renaming_a_rule_changes_the_key():
+    assert RuleSetEngine([Rule('a', 'x')]).key != RuleSetEngine([Rule('b', 'x')]).key
+
+
+def test_rule_sets_are_reloaded_once_changed(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'a': 'x'}), encoding='utf-8')
+    engine = load_rule_set(str(path))
+    assert load_rule_set(str(path)) is engine
+    path.write_text(json.dumps({'renamed': 'x'}), encoding='utf-8')
+    assert summary(load_rule_set(str(path)), 'x') == [('renamed', (0, 1))]
@@ -0,0 +1,62 @@
+""" Following a growing file """
+import os
+
+from re_tester.tail import FileFollower
+
+
+def append(path, data: bytes) -> None:
+    with open(path, 'ab') as a_file:
+        a_file.write(data)
+
+
+def test_appended_lines_and_partial_lines(tmp_path):
+    path = tmp_path / 'app.log'
+    path.write_bytes(b'old\n')
+    follower = FileFollower(str(path))
+    try:
+        assert follower.poll() == ['old']
+        append(path, b'one\r\ntw')
+        assert follower.poll() == ['one']  # 'tw' waits for its newline
+        append(path, b'o\n')
+        assert follower.poll() == ['two']
+        assert follower.poll() == []
+    finally:
+        follower.close()
+
+
+def test_mid_file_start_skips_the_cut_line(tmp_path):
+    path = tmp_path / 'app.log'
+    path.write_bytes(b'first line\nsecond\nthird\n')
+    follower = FileFollower(str(path), max_read=10)
+    try:
+        assert follower.offset == len(b'first line\nsecond\nthird\n') - 10
+        assert follower.poll() == ['third']  # 'cond' was cut
+    finally:
+        follower.close()
+
+
+def test_truncation_starts_over(tmp_path):
+    path = tmp_path / 'app.log'
+    path.write_bytes(b'a long line before truncation\n')
+    follower = FileFollower(str(path))
+    try:
+        follower.poll()
+        path.write_bytes(b'new\n')
+        assert follower.poll() == ['new']
+    finally:
+        follower.close()
+
+
+def test_rotation_drains_the_old_file_then_reads_the_new_one(tmp_path):
+    path = tmp_path / 'app.log'
+    path.write_bytes(b'a\n')
+    follower = FileFollower(str(path))
+    try:
+        assert follower.poll() == ['a']
+        append(path, b'b\nunfinished')
+        os.rename(path, tmp_path / 'app.log.1')
+        assert follower.poll() == []  # The new file is not there yet
+        path.write_bytes(b'c\n')
+        assert follower.poll() == ['b', 'unfinished', 'c']
+    finally:
+        follower.close()
@@ -0,0 +1,26 @@
+""" Out-of-process evaluation """
+import subprocess
+import sys
+from pathlib import Path
+
+# Supersedes a job while its current line has just started, then kills the stuck worker: the new job is left in a
+# pipe nobody reads, and exiting must not wait for it to be written
+_KILLED_WITH_QUEUED_JOB = '''
+import time
+from re_tester.engine import MatchEngine, MODE_FIRST
+from re_tester.worker import EvaluationWorker
+
+if __name__ == '__main__':
+    worker = EvaluationWorker(100)
+    worker.submit(1, MatchEngine(r'(a+)+$', MODE_FIRST), [1, 2], ['b', 'a' * 40 + '!'])
+    while worker._current_line.value != 2:
+        time.sleep(0.001)
+    worker.submit(2, MatchEngine('a', MODE_FIRST), range(1, 100_001), ['a' * 30] * 100_000)
+    assert worker.check_timeout(0)
+    worker.close()
+'''
+
+
+def test_exit_after_killing_a_worker_with_a_queued_job():
+    subprocess.run([sys.executable, '-c', _KILLED_WITH_QUEUED_JOB], cwd=Path(__file__).parents[1], check=True,
+                   timeout=30)